@@ -0,0 +1,124 @@
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from rest_framework.response import Response
+
+from recipes.flags import get_user_flags
+from recipes.models import recipe_prefetches
+from recipes.versions import get_version
+from users.serializers import CustomUserSerializer
+from .serializers import RecipeSharedSerializer, RecipeViewSerializer
+
+RESPONSE_KEY = 'response:{}'
+LOCK_KEY = 'response-lock:{}'
+RECIPE_KEY = 'recipe:{}:{}:{}'
+
+
+def make_key(request, tags):
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    raw = '|'.join((
+        request.build_absolute_uri(request.path),
+        repr(params),
+        *(f'{tag}={get_version(tag)}' for tag in tags),
+    ))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def should_refresh(entry):
+    expires, delta, _ = entry
+    return time.time() - delta * settings.RESPONSE_CACHE_BETA * math.log(
+        1 - random.random()
+    ) >= expires
+
+
+def compute(key, render):
+    start = time.time()
+    response = render()
+    if response.status_code == 200:
+        delta = time.time() - start
+        cache.set(
+            RESPONSE_KEY.format(key),
+            (time.time() + settings.RESPONSE_CACHE_TIMEOUT, delta,
+             response.data),
+            settings.RESPONSE_CACHE_TIMEOUT,
+        )
+    return response
+
+
+def cached_response(request, tags, render):
+    if not settings.RESPONSE_CACHE_TIMEOUT:
+        return render()
+    key = make_key(request, tags)
+    lock = LOCK_KEY.format(key)
+    entry = cache.get(RESPONSE_KEY.format(key))
+    if entry is not None and not should_refresh(entry):
+        return Response(entry[2])
+    if cache.add(lock, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        try:
+            return compute(key, render)
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return Response(entry[2])
+    deadline = time.time() + settings.RESPONSE_CACHE_WAIT
+    while time.time() < deadline:
+        time.sleep(settings.RESPONSE_CACHE_POLL)
+        entry = cache.get(RESPONSE_KEY.format(key))
+        if entry is not None:
+            return Response(entry[2])
+    return render()
+
+
+def render_recipes(recipes, request, tags):
+    base = hashlib.sha1('|'.join((
+        request.build_absolute_uri('/'),
+        *(f'{tag}={get_version(tag)}' for tag in tags),
+    )).encode('utf-8')).hexdigest()
+    keys = {
+        recipe.id: RECIPE_KEY.format(
+            recipe.id, recipe.updated_at.timestamp(), base
+        )
+        for recipe in recipes
+    }
+    shared = cache.get_many(keys.values())
+    missing = [recipe for recipe in recipes if keys[recipe.id] not in shared]
+    if missing:
+        prefetch_related_objects(missing, *recipe_prefetches())
+        rendered = {
+            keys[recipe.id]: RecipeSharedSerializer(
+                recipe, context={'request': request, 'image_variant': 'card'}
+            ).data
+            for recipe in missing
+        }
+        cache.set_many(rendered, settings.RECIPE_CACHE_TIMEOUT)
+        shared.update(rendered)
+    if request.user.is_anonymous:
+        favorites = cart = subscriptions = frozenset()
+    else:
+        favorites, cart, subscriptions = get_user_flags(request.user)
+    data = []
+    for recipe in recipes:
+        author = recipe.author
+        author.is_subscribed = author.id in subscriptions
+        overlay = {
+            'author': CustomUserSerializer(
+                author, context={'request': request}
+            ).data,
+            'is_favorited': recipe.id in favorites,
+            'is_in_shopping_cart': recipe.id in cart,
+        }
+        representation = shared[keys[recipe.id]]
+        data.append({
+            field: overlay[field] if field in overlay
+            else representation[field]
+            for field in RecipeViewSerializer.Meta.fields
+        })
+    return data
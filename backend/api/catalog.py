@@ -0,0 +1,43 @@
+from recipes.models import Ingredient
+from recipes.versions import get_version
+from .search import IngredientIndex
+from .serializers import IngredientSerializer
+
+CATALOG_VERSION = 'ingredients'
+
+
+class IngredientCatalog:
+    def __init__(self, version, ingredients):
+        self.version = version
+        self.items = tuple(
+            IngredientSerializer(ingredients, many=True).data
+        )
+        self.by_id = {item['id']: item for item in self.items}
+        self.index = IngredientIndex(
+            (item['id'], item['name']) for item in self.items
+        )
+
+    def search(self, name=None, measurement_unit=None):
+        items = (
+            [self.by_id[pk] for pk in self.index.search(name)]
+            if name else self.items
+        )
+        if measurement_unit is not None:
+            items = [
+                item for item in items
+                if item['measurement_unit'] == measurement_unit
+            ]
+        return items
+
+
+_catalog = None
+
+
+def get_catalog():
+    global _catalog
+    version = get_version(CATALOG_VERSION)
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        catalog = IngredientCatalog(version, Ingredient.objects.all())
+        _catalog = catalog
+    return catalog
@@ -0,0 +1,35 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(
+        '|'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest())
+
+
+def version_timestamp(version):
+    return version // 10 ** 9
+
+
+def datetime_timestamp(value):
+    return timegm(value.utctimetuple())
+
+
+def conditional_response(request, render, etag, last_modified=None,
+                         vary=()):
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = render()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        if vary:
+            patch_vary_headers(response, vary)
+    return response
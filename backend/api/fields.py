@@ -0,0 +1,79 @@
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework.fields import Field, ImageField
+
+DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+class Base64ImageField(ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Изображение должно быть передано строкой base64.',
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_format': 'Допустимые форматы изображения: {formats}.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid_base64')
+        header, _, payload = data.rpartition(',')
+        if header and not header.endswith(';base64'):
+            self.fail('invalid_base64')
+        payload = ''.join(payload.split())
+        output = SpooledTemporaryFile(max_size=settings.IMAGE_SPOOL_SIZE)
+        size = 0
+        for start in range(0, len(payload), DECODE_CHUNK_SIZE):
+            try:
+                chunk = binascii.a2b_base64(
+                    payload[start:start + DECODE_CHUNK_SIZE]
+                )
+            except (binascii.Error, ValueError):
+                self.fail('invalid_base64')
+            size += len(chunk)
+            if size > settings.MAX_IMAGE_SIZE:
+                self.fail('too_large', max_size=settings.MAX_IMAGE_SIZE)
+            output.write(chunk)
+        output.seek(0)
+        try:
+            with Image.open(output) as image:
+                image_format = image.format
+                image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_format', formats=', '.join(IMAGE_FORMATS))
+        output.seek(0)
+        return UploadedFile(
+            output,
+            name=f'{uuid.uuid4()}.{IMAGE_FORMATS[image_format]}',
+            content_type=Image.MIME[image_format],
+            size=size,
+        )
+
+
+class RecipeImageField(Field):
+    def __init__(self, variant=None, **kwargs):
+        self.variant = variant
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        variant = self.context.get('image_variant', self.variant)
+        image = getattr(recipe, f'image_{variant}', None) or recipe.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
@@ -1,18 +1,68 @@
+from django import forms
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connections
+from django.db.models import (Case, Exists, F, FloatField, IntegerField,
+                              OuterRef, Q, When)
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import (Favorites, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, Tag, TagInRecipe)
+from .catalog import get_catalog
+from .search import FUZZY, PREFIX, SUBSTRING
+
+
+def preserve_order(queryset, ids):
+    return queryset.filter(id__in=ids).order_by(Case(
+        *(When(id=pk, then=position) for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name', 'measurement_unit')
 
+    def filter_name(self, queryset, name, value):
+        if connections[queryset.db].vendor != 'postgresql':
+            return preserve_order(
+                queryset, get_catalog().index.search(value)
+            )
+        return queryset.filter(
+            Q(name__istartswith=value)
+            | Q(name__icontains=value)
+            | Q(name__trigram_similar=value)
+        ).annotate(
+            search_rank=Case(
+                When(name__istartswith=value, then=PREFIX),
+                When(name__icontains=value, then=SUBSTRING),
+                default=FUZZY,
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('name', value),
+        ).order_by('search_rank', '-similarity', 'name')
+
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'cooking_time': ('cooking_time', '-id'),
+}
+
+
+class IntegerInFilter(filters.BaseInFilter, filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
+TAGS_MODES = (
+    ('any', 'any'),
+    ('all', 'all'),
+)
+
 
 class RecipeFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
@@ -20,28 +70,104 @@ class RecipeFilter(filters.FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all(),
         label='Tags',
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='filter_tags_mode',
     )
-    author = filters.CharFilter(
-        field_name='author__id',
-        lookup_expr='icontains',
+    author = IntegerInFilter(
+        field_name='author_id',
+        lookup_expr='in',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=tuple((choice, choice) for choice in RECIPE_ORDERINGS),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags',
+            'tags_mode',
+            'author',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'search',
+            'ordering',
+        )
 
-    def filter_is_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+    def filter_tags(self, queryset, name, value):
+        tag_ids = {tag.id for tag in value}
+        if not tag_ids:
+            return queryset
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            for tag_id in tag_ids:
+                queryset = queryset.filter(Exists(TagInRecipe.objects.filter(
+                    recipe=OuterRef('pk'), tag_id=tag_id
+                )))
+            return queryset
+        return queryset.filter(Exists(TagInRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_ids
+        )))
+
+    def filter_tags_mode(self, queryset, name, value):
         return queryset
 
-    def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return queryset.filter(
-                shopping_cart_recipe__user=self.request.user
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return self.filter_search_fallback(queryset, value)
+        query = SearchQuery(
+            value,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+
+    def filter_search_fallback(self, queryset, value):
+        for word in value.split():
+            queryset = queryset.filter(
+                Q(name__icontains=word)
+                | Q(text__icontains=word)
+                | Exists(IngredientInRecipe.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__name__icontains=word
+                ))
             )
-        return queryset
+        return queryset.annotate(
+            search_rank=Case(
+                When(name__icontains=value, then=1.0),
+                default=0.0,
+                output_field=FloatField(),
+            )
+        ).order_by('-search_rank', '-id')
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
+    def filter_is_favorited(self, queryset, name, value):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(Favorites.objects.filter(
+            recipe=OuterRef('pk'), user=self.request.user
+        )))
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        if not value:
+            return queryset
+        if self.request.user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(ShoppingCart.objects.filter(
+            recipe=OuterRef('pk'), user=self.request.user
+        )))
@@ -0,0 +1,128 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from recipes.models import (RECIPE_CHANGES_VERSION, IngredientInRecipe,
+                            RecipeChange)
+from recipes.versions import get_version
+
+CHANGES_RETENTION = timezone.timedelta(days=1)
+MAX_PENDING_CHANGES = 500
+
+
+class RecipeIngredientIndex:
+    def __init__(self, version):
+        self.version = version
+        self.last_change = 0
+        self.pending = set()
+        self.synced_at = timezone.now()
+        self.postings = defaultdict(lambda: array('q'))
+        self.recipe_ingredients = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version):
+        RecipeChange.objects.filter(
+            created__lt=timezone.now() - CHANGES_RETENTION
+        ).delete()
+        index = cls(version)
+        known = set(RecipeChange.objects.values_list('id', flat=True))
+        if known:
+            index.last_change = max(known)
+            index.track_pending(
+                set(range(min(known), index.last_change + 1)) - known
+            )
+        rows = IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by('recipe_id').iterator()
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, recipe_ingredients in ingredients.items():
+            index.recipe_ingredients[recipe_id] = tuple(recipe_ingredients)
+            for ingredient_id in recipe_ingredients:
+                index.postings[ingredient_id].append(recipe_id)
+        return index
+
+    def track_pending(self, pending):
+        self.pending = set(sorted(pending)[-MAX_PENDING_CHANGES:])
+
+    @property
+    def expired(self):
+        return timezone.now() - self.synced_at > CHANGES_RETENTION
+
+    def remove(self, recipe_id):
+        for ingredient_id in self.recipe_ingredients.pop(recipe_id, ()):
+            posting = self.postings[ingredient_id]
+            position = bisect_left(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                del posting[position]
+
+    def add(self, recipe_id, ingredients):
+        self.recipe_ingredients[recipe_id] = tuple(ingredients)
+        for ingredient_id in ingredients:
+            posting = self.postings[ingredient_id]
+            posting.insert(bisect_left(posting, recipe_id), recipe_id)
+
+    def refresh(self, version):
+        with self.lock:
+            if self.version == version:
+                return
+            changes = dict(RecipeChange.objects.filter(
+                Q(id__gt=self.last_change) | Q(id__in=self.pending)
+            ).values_list('id', 'recipe_id'))
+            last_change = max(self.last_change, *changes, 0)
+            self.track_pending((
+                self.pending
+                | set(range(self.last_change + 1, last_change + 1))
+            ) - changes.keys())
+            recipe_ids = set(changes.values())
+            ingredients = defaultdict(set)
+            for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id'):
+                ingredients[recipe_id].add(ingredient_id)
+            for recipe_id in recipe_ids:
+                self.remove(recipe_id)
+                if ingredients[recipe_id]:
+                    self.add(recipe_id, ingredients[recipe_id])
+            self.last_change = last_change
+            self.synced_at = timezone.now()
+            self.version = version
+
+    def match(self, ingredient_ids, max_missing=None):
+        with self.lock:
+            matched = Counter()
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self.postings.get(ingredient_id, ()))
+            results = []
+            for recipe_id, count in matched.items():
+                total = len(self.recipe_ingredients[recipe_id])
+                missing = total - count
+                if max_missing is not None and missing > max_missing:
+                    continue
+                results.append((recipe_id, count / total, missing))
+        results.sort(key=lambda item: (-item[1], item[2], -item[0]))
+        return results
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    version = get_version(RECIPE_CHANGES_VERSION)
+    index = _index
+    if index is None or index.expired:
+        with _build_lock:
+            index = _index
+            if index is None or index.expired:
+                index = RecipeIngredientIndex.build(version)
+                _index = index
+    index.refresh(version)
+    return index
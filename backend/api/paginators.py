@@ -1,6 +1,192 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+ESTIMATE_MIN_ROWS = 10000
+
+
+def estimate_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (queryset.model._meta.db_table,),
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATE_MIN_ROWS:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return super().count
+        return estimate
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(PageLimitPagination):
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering = ('-pub_date', '-id')
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+        position = self.decode_cursor(queryset.model, request)
+        page = self.get_page(queryset, position)
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = (
+            [self.get_value(page[-1], field) for field in self.fields]
+            if self.has_next else None
+        )
+        return page
+
+    def get_count(self, queryset, request):
+        if request.query_params.get(self.count_query_param) != 'estimate':
+            return None
+        count = estimate_count(queryset)
+        if count is None:
+            count = queryset.count()
+        return count
+
+    def get_page(self, queryset, position):
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return list(queryset[:self.page_size + 1])
+
+    def get_ordering(self, queryset):
+        ordering = [
+            field for field in queryset.query.order_by
+            if isinstance(field, str)
+        ] or list(self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id')
+        return ordering
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_value(self, obj, field):
+        value = getattr(obj, field)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def after(self, position):
+        conditions = []
+        for index, ordering in enumerate(self.ordering):
+            field = ordering.lstrip('-')
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            conditions.append(Q(
+                **dict(zip(self.fields[:index], position[:index])),
+                **{f'{field}__{lookup}': position[index]},
+            ))
+        lookup = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{lookup}': position[0]}) & reduce(
+            or_, conditions
+        )
+
+    def decode_cursor(self, model, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                self.to_python(model, field, value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, field, value):
+        try:
+            return model._meta.get_field(field).to_python(value)
+        except FieldDoesNotExist:
+            if not isinstance(value, (int, float, str)):
+                raise ValueError
+            return value
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()
+        ).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+        return remove_query_param(url, self.page_query_param)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class FeedPagination(KeysetPagination):
+    def use_keyset(self, request):
+        return True
+
+    def get_count(self, timeline, request):
+        return None
+
+    def get_page(self, timeline, position):
+        return timeline.page(position, self.page_size + 1)
+
+    def get_ordering(self, timeline):
+        return list(self.ordering)
@@ -0,0 +1,133 @@
+import csv
+from abc import ABCMeta, abstractmethod
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    charset = 'utf-8'
+    extension = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode('utf-8')
+
+    @abstractmethod
+    def stream(self, rows):
+        pass
+
+    @property
+    def content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    @property
+    def filename(self):
+        return f'shopping-list.{self.extension}'
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, rows):
+        yield f'{SHOPPING_LIST_TITLE}:\n'.encode(self.charset)
+        for name, measurement_unit, amount in rows:
+            yield f'{name}: {amount} {measurement_unit}\n'.encode(
+                self.charset
+            )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield '\ufeff'.encode(self.charset)
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        ).encode(self.charset)
+        for name, measurement_unit, amount in rows:
+            yield writer.writerow(
+                (name, amount, measurement_unit)
+            ).encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 7 * mm
+    margin = 20 * mm
+
+    def get_font(self):
+        if self.font_name in pdfmetrics.getRegisteredFontNames():
+            return self.font_name
+        try:
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_FONT)
+            )
+        except (OSError, TTFError):
+            return 'Helvetica'
+        return self.font_name
+
+    def stream(self, rows):
+        font = self.get_font()
+        width, height = A4
+        max_width = width - 2 * self.margin
+        with SpooledTemporaryFile(
+            max_size=settings.SHOPPING_LIST_SPOOL_SIZE
+        ) as output:
+            canvas = Canvas(output, pagesize=A4)
+            canvas.setTitle(SHOPPING_LIST_TITLE)
+            canvas.setFont(font, self.font_size + 4)
+            top = height - self.margin
+            canvas.drawString(self.margin, top, SHOPPING_LIST_TITLE)
+            y = top - 2 * self.line_height
+            canvas.setFont(font, self.font_size)
+            for name, measurement_unit, amount in rows:
+                for line in simpleSplit(
+                    f'• {name}: {amount} {measurement_unit}',
+                    font,
+                    self.font_size,
+                    max_width,
+                ):
+                    if y < self.margin:
+                        canvas.showPage()
+                        canvas.setFont(font, self.font_size)
+                        y = top
+                    canvas.drawString(self.margin, y, line)
+                    y -= self.line_height
+            canvas.save()
+            output.seek(0)
+            while True:
+                chunk = output.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
@@ -0,0 +1,99 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+SIMILARITY_THRESHOLD = 0.3
+PREFIX, SUBSTRING, FUZZY = range(3)
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(value):
+    return ' '.join(WORD_RE.findall(value.lower().replace('ё', 'е')))
+
+
+def word_trigrams(value):
+    trigrams = set()
+    for word in WORD_RE.findall(value):
+        padded = f'  {word} '
+        trigrams.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return trigrams
+
+
+def substring_trigrams(value):
+    return {value[index:index + 3] for index in range(len(value) - 2)}
+
+
+class IngredientIndex:
+    def __init__(self, rows):
+        entries = sorted(
+            (normalize(name), name, pk) for pk, name in rows
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.ids = [pk for _, _, pk in entries]
+        self.word_trigram_counts = []
+        self.word_postings = defaultdict(list)
+        self.substring_postings = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            trigrams = word_trigrams(key)
+            self.word_trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.word_postings[trigram].append(position)
+            for trigram in substring_trigrams(key):
+                self.substring_postings[trigram].append(position)
+
+    def prefix_positions(self, query):
+        start = bisect_left(self.keys, query)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(query):
+            end += 1
+        return range(start, end)
+
+    def substring_positions(self, query):
+        postings = sorted(
+            (self.substring_postings.get(trigram, ())
+             for trigram in substring_trigrams(query)),
+            key=len,
+        )
+        if not postings:
+            return ()
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return (
+            position for position in candidates
+            if query in self.keys[position]
+        )
+
+    def fuzzy_scores(self, query):
+        trigrams = word_trigrams(query)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.word_postings.get(trigram, ()))
+        scores = {}
+        for position, common in shared.items():
+            similarity = common / (
+                len(trigrams) + self.word_trigram_counts[position] - common
+            )
+            if similarity >= SIMILARITY_THRESHOLD:
+                scores[position] = similarity
+        return scores
+
+    def search(self, query):
+        query = normalize(query)
+        if not query:
+            return list(self.ids)
+        ranks = {
+            position: (PREFIX, 0)
+            for position in self.prefix_positions(query)
+        }
+        if len(query) >= 3:
+            for position in self.substring_positions(query):
+                ranks.setdefault(position, (SUBSTRING, 0))
+            for position, similarity in self.fuzzy_scores(query).items():
+                ranks.setdefault(position, (FUZZY, -similarity))
+        return [
+            self.ids[position]
+            for position in sorted(
+                ranks, key=lambda position: (*ranks[position], position)
+            )
+        ]
@@ -1,17 +1,28 @@
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        PrimaryKeyRelatedField, ReadOnlyField,
-                                        SerializerMethodField, ValidationError)
-from rest_framework.validators import UniqueTogetherValidator
-
-from recipes.models import (Favorites, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from rest_framework.serializers import (IntegerField, ListField,
+                                        ModelSerializer, ReadOnlyField,
+                                        Serializer, SerializerMethodField,
+                                        ValidationError)
+
+from recipes.images import schedule_variants, variant_fields
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            RecipeChange, ShoppingListItem, Tag,
+                            recipe_prefetches)
 from users.models import Subscription
 from users.serializers import CustomUserSerializer
+from .fields import Base64ImageField, RecipeImageField
 
 User = get_user_model()
 
+MAX_MATCH_INGREDIENTS = 100
+MAX_BATCH_RECIPES = 100
+
 
 class TagSerializer(ModelSerializer):
     class Meta:
@@ -25,61 +36,65 @@ class IngredientSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+def resolve_ids(model, ids, duplicate_message, missing_message):
+    errors = []
+    duplicates = sorted(
+        pk for pk, count in Counter(ids).items() if count > 1
+    )
+    if duplicates:
+        errors.append(duplicate_message.format(
+            ids=', '.join(map(str, duplicates))
+        ))
+    objects = model.objects.in_bulk(set(ids))
+    missing = sorted(set(ids) - objects.keys())
+    if missing:
+        errors.append(missing_message.format(
+            ids=', '.join(map(str, missing))
+        ))
+    if errors:
+        raise ValidationError(errors)
+    return objects
+
+
 class IngredientInRecipeSerializer(ModelSerializer):
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IntegerField(min_value=1)
     name = ReadOnlyField(source='ingredient.name')
     measurement_unit = ReadOnlyField(
         source='ingredient.measurement_unit',
     )
-    amount = IntegerField()
+    amount = IntegerField(
+        min_value=settings.INGREDIENTS_MIN_AMOUNT,
+        error_messages={
+            'min_value': settings.INGREDIENTS_MIN_AMOUNT_ERROR.format(
+                min_amount=settings.INGREDIENTS_MIN_AMOUNT
+            ),
+        },
+    )
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
-    def validate_amount(self, value):
-        if int(value) == 1:
-            raise ValidationError(
-                'Рецепт не может быть без ингредиентов!'
-            )
-        return value
-
-
-class FavoritesSerializer(ModelSerializer):
-    class Meta:
-        model = Favorites
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return False
-        if request.user.favorite_user.filter(recipe=data['recipe']).exists():
-            raise ValidationError(
-                'Рецепт уже добавлен в избранное!'
-            )
-        return data
-
-    def to_representation(self, instance):
-        return FavoritePreviewSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')},
-        ).data
-
 
 class FavoritePreviewSerializer(ModelSerializer):
+    image = RecipeImageField(variant='thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
 class RecipeViewSerializer(ModelSerializer):
-    author = CustomUserSerializer(read_only=True)
+    author = SerializerMethodField(
+        read_only=True,
+        source='get_author',
+    )
     tags = TagSerializer(many=True)
     ingredients = SerializerMethodField(
         read_only=True,
         source='get_ingredients',
     )
+    image = RecipeImageField(variant='full')
     is_favorited = SerializerMethodField(
         read_only=True,
         source='get_is_favorited',
@@ -104,29 +119,68 @@ class RecipeViewSerializer(ModelSerializer):
             'cooking_time',
         )
 
+    def get_author(self, obj):
+        author = obj.author
+        if hasattr(obj, 'author_is_subscribed'):
+            author.is_subscribed = obj.author_is_subscribed
+        return CustomUserSerializer(author, context=self.context).data
+
     def get_ingredients(self, obj):
         return IngredientInRecipeSerializer(
-            IngredientInRecipe.objects.filter(recipe=obj),
+            obj.ingredient_recipe.all(),
             many=True,
         ).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return request.user.favorite_user.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return request.user.shopping_cart_user.filter(recipe=obj).exists()
 
 
+class RecipeMatchSerializer(Serializer):
+    ingredients = ListField(
+        child=IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_MATCH_INGREDIENTS,
+    )
+    max_missing = IntegerField(min_value=0, required=False)
+
+
+class RecipeBatchSerializer(Serializer):
+    recipes = ListField(
+        child=IntegerField(min_value=1),
+        min_length=1,
+        max_length=MAX_BATCH_RECIPES,
+    )
+
+
+USER_FIELDS = ('author', 'is_favorited', 'is_in_shopping_cart')
+
+
+class RecipeSharedSerializer(RecipeViewSerializer):
+    class Meta(RecipeViewSerializer.Meta):
+        fields = tuple(
+            field for field in RecipeViewSerializer.Meta.fields
+            if field not in USER_FIELDS
+        )
+
+
 class RecipeCreateSerializer(ModelSerializer):
-    tags = PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
+    tags = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        error_messages={'empty': 'Нужен тег!'},
     )
     image = Base64ImageField()
     ingredients = IngredientInRecipeSerializer(many=True)
@@ -144,38 +198,38 @@ class RecipeCreateSerializer(ModelSerializer):
             'text',
             'cooking_time',
         )
+        extra_kwargs = {
+            'cooking_time': {
+                'error_messages': {
+                    'min_value': (
+                        'Время приготовления не может быть меньше 1 минуты.'
+                    ),
+                },
+            },
+        }
+
+    def validate_ingredients(self, value):
+        if not value:
+            raise ValidationError('Рецепт не может быть без ингредиентов!')
+        ingredients = resolve_ids(
+            Ingredient,
+            [item['id'] for item in value],
+            'Ингредиенты не должны повторяться: {ids}.',
+            'Ингредиенты не найдены: {ids}.',
+        )
+        return [
+            {'id': ingredients[item['id']], 'amount': item['amount']}
+            for item in value
+        ]
 
-    def validate(self, data):
-        ingredients_list = []
-        ingredients = self.initial_data.get('ingredients')
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredients_list:
-                raise ValidationError(
-                    'Ингредиенты не должны повторяться!'
-                )
-            ingredients_list.append(ingredient_id)
-            amount = ingredient['amount']
-            if int(amount) <= 0:
-                raise ValidationError(
-                    'Рецепт не может быть без ингрединтов!'
-                )
-        tags = self.initial_data.get('tags')
-        if not tags:
-            raise ValidationError('Нужен тег!')
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError(
-                    'Теги не должны быть повторяться!'
-                )
-            tags_list.append(tag)
-        cooking_time = self.initial_data.get('cooking_time')
-        if int(cooking_time) <= 0:
-            raise ValidationError(
-                'Время приготовления не может быть меньше 1 минуты.'
-            )
-        return data
+    def validate_tags(self, value):
+        tags = resolve_ids(
+            Tag,
+            value,
+            'Теги не должны повторяться: {ids}.',
+            'Теги не найдены: {ids}.',
+        )
+        return [tags[pk] for pk in value]
 
     def create_bulk_ingredients(self, recipe, ingredients):
         IngredientInRecipe.objects.bulk_create([IngredientInRecipe(
@@ -184,6 +238,7 @@ class RecipeCreateSerializer(ModelSerializer):
             amount=ingredient['amount']
         ) for ingredient in ingredients])
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         ingredients = validated_data.pop('ingredients', None)
@@ -191,26 +246,105 @@ class RecipeCreateSerializer(ModelSerializer):
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
         self.create_bulk_ingredients(recipe, ingredients)
+        Recipe.objects.filter(id=recipe.id).update_search_vector()
+        RecipeChange.objects.record((recipe.id,))
+        transaction.on_commit(partial(schedule_variants, recipe.id))
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_amounts = {}
+        current = {}
+        removed = []
+        for item in recipe.ingredient_recipe.all():
+            ingredient_id = item.ingredient_id
+            old_amounts[ingredient_id] = (
+                old_amounts.get(ingredient_id, 0) + item.amount
+            )
+            if ingredient_id in amounts and ingredient_id not in current:
+                current[ingredient_id] = item
+            else:
+                removed.append(item.id)
+        deltas = {
+            ingredient_id: amount - (
+                current[ingredient_id].amount
+                if ingredient_id in current else 0
+            )
+            for ingredient_id, amount in amounts.items()
+        }
+        changed = []
+        for ingredient_id, item in current.items():
+            if item.amount != amounts[ingredient_id]:
+                item.amount = amounts[ingredient_id]
+                changed.append(item)
+        added = [
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        IngredientInRecipe.objects.filter(id__in=removed).delete()
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        IngredientInRecipe.objects.bulk_create(added)
+        if any(deltas.values()):
+            ShoppingListItem.objects.apply_deltas(
+                recipe.shopping_cart_recipe.values_list('user_id', flat=True),
+                deltas,
+            )
+        rows_changed = bool(removed or changed or added)
+        return rows_changed, old_amounts.keys() != amounts.keys()
+
+    def update_tags(self, recipe, tags):
+        old_ids = set(recipe.tags.values_list('id', flat=True))
+        new_ids = {tag.id for tag in tags}
+        if old_ids == new_ids:
+            return False
+        recipe.tags.remove(*old_ids - new_ids)
+        recipe.tags.add(*new_ids - old_ids)
+        return True
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.image = validated_data.get('image', instance.image)
-        instance.cooking_time = validated_data.get(
-            'cooking_time',
-            instance.cooking_time
-        )
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
-        self.create_bulk_ingredients(instance, ingredients)
-        if tags:
-            instance.tags.set(tags)
-        instance.save()
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        update_fields = []
+        for field in ('name', 'text', 'cooking_time'):
+            if field in validated_data and (
+                validated_data[field] != getattr(instance, field)
+            ):
+                setattr(instance, field, validated_data[field])
+                update_fields.append(field)
+        image_changed = validated_data.get('image') is not None
+        if image_changed:
+            instance.image = validated_data['image']
+            update_fields.append('image')
+            for field in variant_fields():
+                setattr(instance, field, '')
+                update_fields.append(field)
+        ingredients_changed = ingredient_set_changed = tags_changed = False
+        if ingredients is not None:
+            ingredients_changed, ingredient_set_changed = (
+                self.update_ingredients(instance, ingredients)
+            )
+        if tags is not None:
+            tags_changed = self.update_tags(instance, tags)
+        if update_fields or ingredients_changed or tags_changed:
+            instance.save(update_fields=[*update_fields, 'updated_at'])
+        if ingredient_set_changed:
+            Recipe.objects.filter(id=instance.id).update_search_vector()
+            RecipeChange.objects.record((instance.id,))
+        if image_changed:
+            transaction.on_commit(partial(schedule_variants, instance.id))
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], *recipe_prefetches())
         return RecipeViewSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -221,13 +355,6 @@ class FollowSerializer(ModelSerializer):
     class Meta:
         model = Subscription
         fields = ('user', 'author')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=('user', 'author'),
-                message='Вы уже подписаны.'
-            )
-        ]
 
     def to_representation(self, instance):
         return SubscriptionSerializer(
@@ -237,13 +364,30 @@ class FollowSerializer(ModelSerializer):
 
 
 class FollowRecipeSerializer(ModelSerializer):
+    image = RecipeImageField(variant='thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
-        ordering = ('id',)
 
-    def to_representation(self, instance):
-        return RecipeViewSerializer(instance).data
+
+def get_recipes_limit(request):
+    try:
+        return max(int(request.query_params['recipes_limit']), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+def group_recipes_by_author(author_ids, limit=None):
+    recipes_by_author = {author_id: [] for author_id in author_ids}
+    if not recipes_by_author or limit == 0:
+        return recipes_by_author
+    for recipe in Recipe.objects.latest_per_author(author_ids, limit).only(
+        'id', 'name', 'image', 'image_thumb', 'cooking_time', 'author_id',
+        'pub_date',
+    ):
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
 
 
 class SubscriptionSerializer(ModelSerializer):
@@ -269,46 +413,27 @@ class SubscriptionSerializer(ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
         return request.user.follower.filter(author=obj).exists()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        if not request.user.is_anonymous:
-            context = {'request': request}
-            recipes_limit = request.query_params.get('recipes_limit')
-        else:
-            return False
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
-        else:
-            recipes = obj.recipes.all()
-        return FollowRecipeSerializer(recipes, many=True, context=context).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-
-class ShoppingCartSerializer(ModelSerializer):
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipe = data['recipe']
-        if request.user.shoping_cart_user.filter(recipe=recipe).exists():
-            raise ValidationError(
-                'Уже добавлено в список покупок!'
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is None:
+            recipes_by_author = group_recipes_by_author(
+                (obj.id,), get_recipes_limit(request)
             )
-        return data
-
-    def to_representation(self, instance):
-        return RecipeViewSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')},
+        return FollowRecipeSerializer(
+            recipes_by_author.get(obj.id, ()),
+            many=True,
+            context={'request': request},
         ).data
+
+    def get_recipes_count(self, obj):
+        return obj.recipes_count
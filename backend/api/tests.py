@@ -0,0 +1,870 @@
+import asyncio
+import base64
+import io
+import os
+import textwrap
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import (AsyncClient, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import matching
+from api.fields import DECODE_CHUNK_SIZE, Base64ImageField
+from api.renderers import ShoppingListTextRenderer
+from api.serializers import group_recipes_by_author
+from foodgram.asgi import application
+from foodgram.db import check_connections, release_connections
+from recipes.models import (RECIPE_CHANGES_VERSION, Favorites, Ingredient,
+                            IngredientInRecipe, Recipe, RecipeChange,
+                            ShoppingCart, ShoppingListItem, Tag,
+                            TagInRecipe)
+from recipes.toggles import SHOPPING_CART
+from recipes.versions import bump_version
+from users.models import Subscription, User
+
+RECIPES_COUNT = 10
+RECIPES_PER_TAG = 3000
+
+
+class RecipeQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                email=f'author{index}@example.com',
+                password='pass',
+            )
+            for index in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(4)
+        ]
+        for index in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=authors[index % len(authors)],
+                name=f'Рецепт {index}',
+                text='Текст',
+                cooking_time=index + 1,
+                image='recipes/test.png',
+            )
+            recipe.tags.set(tags[:index % len(tags) + 1])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=index + 1
+                )
+                for ingredient in ingredients
+            )
+            if index % 2:
+                Favorites.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=authors[0])
+        cls.recipe = Recipe.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = APIClient()
+        self.authorized_client = APIClient()
+        self.authorized_client.force_authenticate(self.user)
+
+    def assert_list_queries(self, client, queries):
+        for limit in (2, 8):
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get('/api/recipes/', {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_guest(self):
+        self.assert_list_queries(self.guest_client, 4)
+
+    def test_list_authorized(self):
+        self.assert_list_queries(self.authorized_client, 7)
+
+    def test_detail_guest(self):
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(
+                f'/api/recipes/{self.recipe.id}/'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_authorized(self):
+        with self.assertNumQueries(3):
+            response = self.authorized_client.get(
+                f'/api/recipes/{self.recipe.id}/'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 4)
+
+    def test_recipe_change_keeps_other_cards_cached(self):
+        self.authorized_client.get('/api/recipes/', {'limit': 8})
+        bump_version('recipes')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(
+                '/api/recipes/', {'limit': 8}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            'recipes_ingredientinrecipe' in query['sql']
+            for query in queries
+        ))
+
+
+class TagFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {index}',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+            for index in range(RECIPES_PER_TAG + 2)
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        TagInRecipe.objects.bulk_create(
+            TagInRecipe(recipe=recipe, tag=tag)
+            for recipe in recipes[:RECIPES_PER_TAG]
+            for tag in cls.tags
+        )
+        TagInRecipe.objects.bulk_create((
+            TagInRecipe(recipe=recipes[-2], tag=cls.tags[0]),
+            TagInRecipe(recipe=recipes[-1], tag=cls.tags[1]),
+        ))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, **params):
+        return self.client.get('/api/recipes/', {
+            'tags': [tag.slug for tag in self.tags],
+            'limit': 10,
+            **params,
+        })
+
+    def test_any_mode_counts_each_recipe_once(self):
+        response = self.get()
+        self.assertEqual(response.data['count'], RECIPES_PER_TAG + 2)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_all_mode_requires_every_tag(self):
+        response = self.get(tags_mode='all')
+        self.assertEqual(response.data['count'], RECIPES_PER_TAG)
+
+    def test_deep_page_costs_the_same_queries(self):
+        last_page = RECIPES_PER_TAG // 10
+        with CaptureQueriesContext(connection) as first:
+            self.get(page=1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as deep:
+            response = self.get(page=last_page)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(first), len(deep))
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {index}',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+                favorites_count=index % 4,
+            )
+            for index in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_cursor_walks_every_recipe_once(self):
+        url = '/api/recipes/?ordering=popular&pagination=cursor&limit=4'
+        seen = []
+        while url:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            seen.extend(recipe['id'] for recipe in response.data['results'])
+            if 'cursor=' in url:
+                self.assertIn(
+                    '"favorites_count" <= ',
+                    ' '.join(query['sql'] for query in queries),
+                )
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(
+            Recipe.objects.values_list('id', flat=True)
+        ))
+        self.assertEqual(len(seen), len(set(seen)))
+
+
+class Base64ImageFieldTest(TestCase):
+    def test_line_wrapped_payload(self):
+        side = 128
+        image = Image.frombytes(
+            'RGB', (side, side), os.urandom(side * side * 3)
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        self.assertGreater(len(encoded), DECODE_CHUNK_SIZE)
+        uploaded = Base64ImageField().to_internal_value(
+            'data:image/png;base64,' + '\n'.join(textwrap.wrap(encoded, 76))
+        )
+        self.assertEqual(uploaded.read(), buffer.getvalue())
+
+
+class RecipePartialUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        cls.tag = Tag.objects.create(name='Тег', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=1,
+            image='recipes/test.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+        IngredientInRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=5
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_patch_without_ingredients_and_tags(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'name': 'Новое название'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Новое название')
+        self.assertEqual(list(self.recipe.tags.all()), [self.tag])
+        self.assertEqual(self.recipe.ingredient_recipe.get().amount, 5)
+
+    def test_ingredient_changes_reach_shopping_list(self):
+        other = Ingredient.objects.create(
+            name='Другой', measurement_unit='мл'
+        )
+        ShoppingCart.objects.create(user=self.author, recipe=self.recipe)
+        for ingredients, expected in (
+            ([(other, 7)], {'Другой': 7}),
+            (
+                [(other, 3), (self.ingredient, 2)],
+                {'Другой': 3, 'Ингредиент': 2},
+            ),
+        ):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {'ingredients': [
+                    {'id': ingredient.id, 'amount': amount}
+                    for ingredient, amount in ingredients
+                ]},
+                format='json',
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                dict(ShoppingListItem.objects.filter(
+                    user=self.author
+                ).values_list('ingredient__name', 'total_amount')),
+                expected,
+            )
+
+
+class AuthorFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                email=f'author{index}@example.com',
+                password='pass',
+            )
+            for index in range(12)
+        ]
+        for author in cls.authors:
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {author.username}',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+            Favorites.objects.create(user=cls.reader, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_exact_author_ids(self):
+        first, second = self.authors[0], self.authors[1]
+        response = self.client.get(
+            '/api/recipes/', {'author': f'{first.id},{second.id}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {recipe['author']['id'] for recipe in response.data['results']},
+            {first.id, second.id},
+        )
+
+    def test_non_integer_author_is_rejected(self):
+        for value in ('1.5', 'x'):
+            with self.subTest(value=value):
+                response = self.client.get('/api/recipes/', {'author': value})
+                self.assertEqual(response.status_code, 400)
+
+    def get_page_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/recipes/', {
+                'author': self.authors[0].id,
+                'is_favorited': 1,
+            })
+        return next(
+            query['sql'] for query in queries
+            if 'recipes_favorites' in query['sql']
+            and 'COUNT' not in query['sql']
+        )
+
+    def test_favorites_filter_does_not_join(self):
+        sql = self.get_page_sql()
+        self.assertNotIn('JOIN "recipes_favorites"', sql)
+        self.assertIn('EXISTS', sql)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_author_filter_uses_index(self):
+        sql = self.get_page_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('author_id=?', plan)
+
+
+@override_settings(DB_HEALTH_CHECKS=True, DB_HEALTH_CHECK_IDLE=30)
+class ConnectionHealthCheckTest(TestCase):
+    def setUp(self):
+        connection.ensure_connection()
+
+    def test_recently_used_connection_is_not_checked(self):
+        release_connections()
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            for _ in range(100):
+                check_connections()
+        is_usable.assert_not_called()
+
+    def test_idle_connection_is_checked(self):
+        release_connections()
+        connection.released_at -= 31
+        with mock.patch.object(
+            connection, 'is_usable', return_value=True
+        ) as is_usable:
+            check_connections()
+        is_usable.assert_called_once_with()
+
+
+class ShoppingListDownloadTest(TestCase):
+    URL = '/api/recipes/download_shopping_cart/'
+    CONCURRENT_DOWNLOADS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        recipes = []
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {index}',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=index + 1
+                )
+                for ingredient in ingredients
+            )
+            recipes.append(recipe.id)
+        SHOPPING_CART.add(cls.user.id, recipes)
+
+    def test_wsgi_mode_streams(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(SERVER_MODE='wsgi'):
+            response = client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn(
+            'Ингредиент 0: 6 г',
+            b''.join(response.streaming_content).decode(),
+        )
+
+    @override_settings(SERVER_MODE='asgi')
+    def test_asgi_mode_serves_concurrent_downloads(self):
+        client = AsyncClient()
+
+        async def download_all():
+            return await asyncio.gather(*(
+                client.get(self.URL, authorization=f'Token {self.token.key}')
+                for _ in range(self.CONCURRENT_DOWNLOADS)
+            ))
+
+        responses = async_to_sync(download_all)()
+        self.assertEqual(
+            {response.status_code for response in responses}, {200}
+        )
+        bodies = {
+            b''.join(response.streaming_content) for response in responses
+        }
+        self.assertEqual(len(bodies), 1)
+        self.assertIn('Ингредиент 0: 6 г', bodies.pop().decode())
+
+
+def slow_stream(self, rows):
+    time.sleep(ASGIConcurrencyTest.DELAY)
+    yield b'ok'
+
+
+@override_settings(SERVER_MODE='asgi')
+class ASGIConcurrencyTest(TransactionTestCase):
+    URL = '/api/recipes/download_shopping_cart/'
+    CONCURRENT_REQUESTS = 5
+    DELAY = 0.3
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+        )
+        self.token = Token.objects.create(user=user)
+
+    async def request(self):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await application({
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': self.URL,
+            'query_string': b'',
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 0),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        }, receive, send)
+        return messages[0]['status']
+
+    async def request_all(self):
+        return await asyncio.gather(*(
+            self.request() for _ in range(self.CONCURRENT_REQUESTS)
+        ))
+
+    def test_slow_requests_do_not_wait_for_each_other(self):
+        with mock.patch.object(
+            ShoppingListTextRenderer, 'stream', slow_stream
+        ):
+            started = time.monotonic()
+            statuses = asyncio.run(self.request_all())
+            elapsed = time.monotonic() - started
+        self.assertEqual(set(statuses), {200})
+        self.assertLess(elapsed, self.DELAY * self.CONCURRENT_REQUESTS / 2)
+
+
+class RecipeMatchTest(TestCase):
+    URL = '/api/recipes/match/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(4)
+        ]
+        cls.short = cls.create_recipe('Короткий', cls.ingredients[:2])
+        cls.long = cls.create_recipe('Длинный', cls.ingredients)
+
+    @classmethod
+    def create_recipe(cls, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author,
+            name=name,
+            text='Текст',
+            cooking_time=1,
+            image='recipes/test.png',
+        )
+        for ingredient in ingredients:
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        matching._index = None
+        self.client = APIClient()
+
+    def match(self, ingredients, **params):
+        response = self.client.get(self.URL, {
+            'ingredients': [ingredient.id for ingredient in ingredients],
+            **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            (recipe['id'], recipe['coverage'], recipe['missing'])
+            for recipe in response.data['results']
+        ]
+
+    def test_ranks_by_coverage(self):
+        self.assertEqual(self.match(self.ingredients[:2]), [
+            (self.short.id, 1.0, 0),
+            (self.long.id, 0.5, 2),
+        ])
+
+    def test_max_missing(self):
+        self.assertEqual(
+            self.match(self.ingredients[:3], max_missing=1),
+            [(self.short.id, 1.0, 0), (self.long.id, 0.75, 1)],
+        )
+        self.assertEqual(
+            self.match(self.ingredients[:2], max_missing=1),
+            [(self.short.id, 1.0, 0)],
+        )
+
+    def test_refresh_after_create_update_and_delete(self):
+        self.match(self.ingredients[:1])
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.create_recipe('Новый', self.ingredients[3:])
+        self.assertEqual(
+            self.match(self.ingredients[3:]),
+            [(created.id, 1.0, 0), (self.long.id, 0.25, 3)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientInRecipe.objects.filter(
+                recipe=self.long, ingredient__in=self.ingredients[2:]
+            ).delete()
+        self.assertEqual(
+            self.match(self.ingredients[:2]),
+            [(self.long.id, 1.0, 0), (self.short.id, 1.0, 0)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.short.delete()
+        self.assertEqual(
+            self.match(self.ingredients[:2]), [(self.long.id, 1.0, 0)]
+        )
+
+    def test_change_committed_out_of_order_is_picked_up(self):
+        self.match(self.ingredients[:1])
+        last = RecipeChange.objects.order_by('-id').first().id
+        late = self.create_recipe('Поздний', self.ingredients[3:])
+        RecipeChange.objects.all().delete()
+        RecipeChange.objects.create(id=last + 2, recipe_id=self.short.id)
+        bump_version(RECIPE_CHANGES_VERSION)
+        self.assertEqual(
+            self.match(self.ingredients[3:]), [(self.long.id, 0.25, 3)]
+        )
+        RecipeChange.objects.create(id=last + 1, recipe_id=late.id)
+        bump_version(RECIPE_CHANGES_VERSION)
+        self.assertEqual(
+            self.match(self.ingredients[3:]),
+            [(late.id, 1.0, 0), (self.long.id, 0.25, 3)],
+        )
+
+
+class RecipeToggleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+        )
+        cls.salt = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        cls.water = Ingredient.objects.create(
+            name='Вода', measurement_unit='мл'
+        )
+        cls.recipes = []
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {index}',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=cls.salt, amount=index + 1
+            )
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=cls.water, amount=100
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def counter(self, field):
+        return list(Recipe.objects.order_by('id').values_list(
+            field, flat=True
+        ))
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient__name', 'total_amount'))
+
+    def flags(self):
+        return {
+            recipe['id']: (
+                recipe['is_favorited'], recipe['is_in_shopping_cart']
+            )
+            for recipe in self.client.get('/api/recipes/').data['results']
+        }
+
+    def test_favorite_is_idempotent(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.id}/favorite/'
+        self.client.get('/api/recipes/')
+        self.assertEqual(self.send('post', url).status_code, 201)
+        self.assertEqual(self.send('post', url).status_code, 200)
+        self.assertEqual(self.counter('favorites_count'), [1, 0])
+        self.assertEqual(Favorites.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.flags()[recipe.id], (True, False))
+        self.assertEqual(self.send('delete', url).status_code, 204)
+        self.assertEqual(self.send('delete', url).status_code, 204)
+        self.assertEqual(self.counter('favorites_count'), [0, 0])
+        self.assertFalse(Favorites.objects.exists())
+        self.assertEqual(self.flags()[recipe.id], (False, False))
+
+    def test_shopping_cart_keeps_list_consistent(self):
+        recipe = self.recipes[1]
+        url = f'/api/recipes/{recipe.id}/shopping_cart/'
+        self.assertEqual(self.send('post', url).status_code, 201)
+        self.assertEqual(self.send('post', url).status_code, 200)
+        self.assertEqual(self.counter('in_carts_count'), [0, 1])
+        self.assertEqual(self.shopping_list(), {'Соль': 2, 'Вода': 100})
+        self.assertEqual(self.flags()[recipe.id], (False, True))
+        self.send('delete', url)
+        self.send('delete', url)
+        self.assertEqual(self.counter('in_carts_count'), [0, 0])
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_batch_endpoints(self):
+        ids = [recipe.id for recipe in self.recipes]
+        url = '/api/recipes/shopping_cart/'
+        response = self.send('post', url, {'recipes': [*ids, 999999]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'added': ids})
+        self.assertEqual(
+            self.send('post', url, {'recipes': ids}).data, {'added': []}
+        )
+        self.assertEqual(self.counter('in_carts_count'), [1, 1])
+        self.assertEqual(self.shopping_list(), {'Соль': 3, 'Вода': 200})
+        self.assertEqual(
+            self.send('delete', url, {'recipes': ids[:1]}).data,
+            {'removed': ids[:1]},
+        )
+        self.assertEqual(
+            self.send('delete', url, {'recipes': ids[:1]}).data,
+            {'removed': []},
+        )
+        self.assertEqual(self.counter('in_carts_count'), [0, 1])
+        self.assertEqual(self.shopping_list(), {'Соль': 2, 'Вода': 100})
+        response = self.send(
+            'post', '/api/recipes/favorite/', {'recipes': ids}
+        )
+        self.assertEqual(response.data, {'added': ids})
+        self.assertEqual(self.counter('favorites_count'), [1, 1])
+        self.assertEqual(
+            self.flags(), {ids[0]: (True, False), ids[1]: (True, True)}
+        )
+
+    def test_batch_rejects_invalid_ids(self):
+        response = self.send(
+            'post', '/api/recipes/favorite/', {'recipes': ['x']}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SubscriptionRecipesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'writer{index}',
+                email=f'writer{index}@example.com',
+                password='pass',
+            )
+            for index in range(2)
+        ]
+        start = timezone.now() - timedelta(days=1)
+        cls.recipes = {}
+        for author in cls.authors:
+            recipes = [
+                Recipe.objects.create(
+                    author=author,
+                    name=f'{author.username} {index}',
+                    text='Текст',
+                    cooking_time=1,
+                    image='recipes/test.png',
+                )
+                for index in range(3)
+            ]
+            for recipe, hours in zip(recipes, (2, 1, 1)):
+                Recipe.objects.filter(id=recipe.id).update(
+                    pub_date=start + timedelta(hours=hours)
+                )
+            cls.recipes[author.id] = [
+                recipes[0].id, recipes[2].id, recipes[1].id
+            ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self):
+        Subscription.objects.bulk_create(
+            Subscription(user=self.user, author=author)
+            for author in self.authors
+        )
+
+    def test_no_subscriptions(self):
+        self.assertEqual(group_recipes_by_author([]), {})
+        self.assertFalse(Recipe.objects.latest_per_author([], 1).exists())
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_latest_first_per_author(self):
+        self.subscribe()
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(
+            {
+                author['id']: [recipe['id'] for recipe in author['recipes']]
+                for author in response.data['results']
+            },
+            self.recipes,
+        )
+        self.assertEqual(
+            [author['recipes_count'] for author in response.data['results']],
+            [3, 3],
+        )
+
+    def test_recipes_limit(self):
+        self.subscribe()
+        for limit, expected in (('2', 2), ('0', 0), ('abc', 3)):
+            response = self.client.get(
+                '/api/users/subscriptions/', {'recipes_limit': limit}
+            )
+            self.assertEqual(
+                {
+                    author['id']: [
+                        recipe['id'] for recipe in author['recipes']
+                    ]
+                    for author in response.data['results']
+                },
+                {
+                    author_id: ids[:expected]
+                    for author_id, ids in self.recipes.items()
+                },
+            )
+
+    def test_group_recipes_by_author(self):
+        author_ids = [author.id for author in self.authors]
+        grouped = group_recipes_by_author(author_ids, 1)
+        self.assertEqual(
+            {
+                author_id: [recipe.id for recipe in recipes]
+                for author_id, recipes in grouped.items()
+            },
+            {
+                author_id: ids[:1]
+                for author_id, ids in self.recipes.items()
+            },
+        )
+        self.assertEqual(
+            group_recipes_by_author(author_ids, 0),
+            {author_id: [] for author_id in author_ids},
+        )
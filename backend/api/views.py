@@ -1,5 +1,9 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from functools import partial
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
@@ -7,14 +11,37 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import (Favorites, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.feed import Timeline
+from recipes.models import (Ingredient, Recipe, ShoppingListItem, Tag,
+                            recipe_prefetches)
+from recipes.toggles import FAVORITES, SHOPPING_CART
+from recipes.versions import get_version
+from .cache import cached_response, render_recipes
+from .catalog import CATALOG_VERSION, get_catalog
+from .conditional import (conditional_response, datetime_timestamp,
+                          make_etag, version_timestamp)
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import PageLimitPagination
+from .matching import get_index
+from .paginators import (FeedPagination, KeysetPagination,
+                         PageLimitPagination)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (FavoritesSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeViewSerializer,
-                          ShoppingCartSerializer, TagSerializer)
+from .renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer)
+from .serializers import (FavoritePreviewSerializer, IngredientSerializer,
+                          RecipeBatchSerializer, RecipeCreateSerializer,
+                          RecipeMatchSerializer, RecipeViewSerializer,
+                          TagSerializer)
+
+RECIPE_CACHE_TAGS = ('tags', CATALOG_VERSION)
+RESPONSE_CACHE_TAGS = ('recipes', *RECIPE_CACHE_TAGS)
+
+
+def spool(chunks):
+    output = SpooledTemporaryFile(max_size=settings.SHOPPING_LIST_SPOOL_SIZE)
+    for chunk in chunks:
+        output.write(chunk)
+    output.seek(0)
+    return output
 
 
 class TagsViewSet(viewsets.ReadOnlyModelViewSet):
@@ -23,6 +50,27 @@ class TagsViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
+    def get_conditional_response(self, request, render, *parts):
+        version = get_version('tags')
+        return conditional_response(
+            request,
+            render,
+            make_etag('tags', version, *parts),
+            version_timestamp(version),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            kwargs['pk'],
+        )
+
 
 class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -32,36 +80,239 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = IngredientFilter
 
+    def get_conditional_response(self, request, render, *parts):
+        version = get_version(CATALOG_VERSION)
+        return conditional_response(
+            request,
+            render,
+            make_etag(
+                'ingredients',
+                version,
+                request.query_params.get('name'),
+                request.query_params.get('measurement_unit'),
+                *parts,
+            ),
+            version_timestamp(version),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_CACHE:
+            return self.get_conditional_response(
+                request, partial(super().list, request, *args, **kwargs)
+            )
+        return self.get_conditional_response(request, lambda: Response(
+            get_catalog().search(
+                name=request.query_params.get('name'),
+                measurement_unit=request.query_params.get(
+                    'measurement_unit'
+                ),
+            )
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_CACHE:
+            return self.get_conditional_response(
+                request,
+                partial(super().retrieve, request, *args, **kwargs),
+                kwargs['pk'],
+            )
+        try:
+            ingredient = get_catalog().by_id[int(kwargs['pk'])]
+        except (KeyError, ValueError):
+            raise Http404
+        return self.get_conditional_response(
+            request, lambda: Response(ingredient), kwargs['pk']
+        )
+
 
 class RecipesViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    pagination_class = PageLimitPagination
+    pagination_class = KeysetPagination
     permission_classes = (IsAuthorOrReadOnly, )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.request.method == 'GET':
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return Recipe.objects.all()
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeViewSerializer
         return RecipeCreateSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_variant'] = 'card'
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            page = self.paginate_queryset(self.filter_queryset(
+                Recipe.objects.select_related('author')
+            ))
+            return self.get_paginated_response(
+                render_recipes(page, request, RECIPE_CACHE_TAGS)
+            )
+        return cached_response(
+            request,
+            RESPONSE_CACHE_TAGS,
+            partial(super().list, request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = get_object_or_404(
+            Recipe.objects.select_related('author').with_user_flags(
+                request.user
+            ),
+            pk=kwargs['pk'],
+        )
+        self.check_object_permissions(request, recipe)
+        author = recipe.author
+        tags_version = get_version('tags')
+        ingredients_version = get_version(CATALOG_VERSION)
+        last_modified = None
+        if request.user.is_anonymous:
+            last_modified = max(
+                datetime_timestamp(recipe.updated_at),
+                version_timestamp(tags_version),
+                version_timestamp(ingredients_version),
+            )
+
+        def render():
+            prefetch_related_objects([recipe], *recipe_prefetches())
+            return Response(self.get_serializer(recipe).data)
+
+        if request.user.is_anonymous:
+            render = partial(
+                cached_response, request, RESPONSE_CACHE_TAGS, render
+            )
+
+        return conditional_response(
+            request,
+            render,
+            make_etag(
+                'recipe',
+                recipe.id,
+                recipe.updated_at.isoformat(),
+                author.username,
+                author.email,
+                author.first_name,
+                author.last_name,
+                recipe.is_favorited,
+                recipe.is_in_shopping_cart,
+                recipe.author_is_subscribed,
+                tags_version,
+                ingredients_version,
+            ),
+            last_modified,
+            vary=('Authorization',),
+        )
+
+    @action(
+        methods=('get',),
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated, ),
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(
+            Timeline(request.user, Recipe.objects.select_related('author')),
+            request,
+            self,
+        )
+        return paginator.get_paginated_response(
+            render_recipes(page, request, RECIPE_CACHE_TAGS)
+        )
+
+    @action(
+        methods=('get',),
+        detail=False,
+        url_path='match',
+    )
+    def match(self, request):
+        data = {'ingredients': request.query_params.getlist('ingredients')}
+        if 'max_missing' in request.query_params:
+            data['max_missing'] = request.query_params['max_missing']
+        serializer = RecipeMatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        paginator = PageLimitPagination()
+        page = paginator.paginate_queryset(
+            get_index().match(
+                serializer.validated_data['ingredients'],
+                serializer.validated_data.get('max_missing'),
+            ),
+            request,
+            self,
+        )
+        recipes = Recipe.objects.select_related('author').in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        matches = [
+            (recipes[recipe_id], coverage, missing)
+            for recipe_id, coverage, missing in page
+            if recipe_id in recipes
+        ]
+        data = render_recipes(
+            [recipe for recipe, _, _ in matches],
+            request,
+            RECIPE_CACHE_TAGS,
+        )
+        for item, (_, coverage, missing) in zip(data, matches):
+            item['coverage'] = round(coverage, 4)
+            item['missing'] = missing
+        return paginator.get_paginated_response(data)
+
+    def toggle(self, request, pk, toggle):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        if request.method == 'POST':
+            added = toggle.add(request.user.id, (recipe.id,))
+            return Response(
+                FavoritePreviewSerializer(
+                    recipe,
+                    context={'request': request},
+                ).data,
+                status=(
+                    status.HTTP_201_CREATED if added else status.HTTP_200_OK
+                ),
+            )
+        toggle.remove(request.user.id, (recipe.id,))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def toggle_many(self, request, toggle):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return Response(
+                {'added': toggle.add(request.user.id, recipe_ids)}
+            )
+        return Response(
+            {'removed': toggle.remove(request.user.id, recipe_ids)}
+        )
+
     @action(
         methods=('post', 'delete'),
         detail=True,
         url_path='favorite',
         permission_classes=(IsAuthenticated, ),
     )
-    def set_favorite(self, request, pk=id):
-        user = request.user
-        if request.method == 'POST':
-            recipe = get_object_or_404(Recipe, pk=pk)
-            favorite = Favorites.objects.create(user=user, recipe=recipe)
-            serializer = FavoritesSerializer(favorite)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def set_favorite(self, request, pk=None):
+        return self.toggle(request, pk, FAVORITES)
 
-        favorite = get_object_or_404(Favorites, user=user, recipe__id=pk)
-        favorite.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        methods=('post', 'delete'),
+        detail=False,
+        url_path='favorite',
+        permission_classes=(IsAuthenticated, ),
+    )
+    def set_favorite_many(self, request):
+        return self.toggle_many(request, FAVORITES)
 
     @action(
         detail=True,
@@ -70,46 +321,52 @@ class RecipesViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated, ),
     )
     def set_shopping_cart(self, request, pk=None):
-        user = self.request.user
-        if request.method == 'POST':
-            recipe = get_object_or_404(Recipe, pk=pk)
-            in_shopping_cart = ShoppingCart.objects.create(
-                user=user,
-                recipe=recipe
-            )
-            serializer = ShoppingCartSerializer(in_shopping_cart)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.toggle(request, pk, SHOPPING_CART)
 
-        in_shopping_cart = get_object_or_404(
-            ShoppingCart,
-            user=user,
-            recipe__id=pk
-        )
-        in_shopping_cart.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated, ),
+    )
+    def set_shopping_cart_many(self, request):
+        return self.toggle_many(request, SHOPPING_CART)
 
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated, )
+        permission_classes=(IsAuthenticated, ),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
-        shopping_cart = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart_recipe__user=request.user
+        shopping_cart = ShoppingListItem.objects.filter(
+            user=request.user,
+            total_amount__gt=0,
         ).values_list(
-            'ingredient__name', 'ingredient__measurement_unit'
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'total_amount',
         ).order_by(
             'ingredient__name'
-        ).annotate(
-            ingredient_total=Sum('amount')
-        )
-        text = 'Cписок покупок: \n'
-        for ingredients in shopping_cart:
-            name, measurement_unit, amount = ingredients
-            text += f'{name}: {amount} {measurement_unit}\n'
-        response = HttpResponse(text, content_type='text/plain')
+        ).iterator(chunk_size=settings.SHOPPING_LIST_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        if settings.SERVER_MODE == 'asgi':
+            return FileResponse(
+                spool(renderer.stream(shopping_cart)),
+                as_attachment=True,
+                filename=renderer.filename,
+                content_type=renderer.content_type,
+            )
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_cart),
+            content_type=renderer.content_type,
+        )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping-list.pdf"'
+            f'attachment; filename="{renderer.filename}"'
         )
         return response
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+
+
+class FoodgramConfig(AppConfig):
+    name = 'foodgram'
+
+    def ready(self):
+        from .db import check_connections, release_connections
+        request_started.connect(
+            check_connections, dispatch_uid='check_db_connections'
+        )
+        request_finished.connect(
+            release_connections, dispatch_uid='release_db_connections'
+        )
@@ -0,0 +1,22 @@
+import os
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.asgi import get_asgi_application
+from django.db import connections
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+
+class ThreadPerRequest:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                await sync_to_async(connections.close_all)()
+
+
+application = ThreadPerRequest(get_asgi_application())
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        released_at = getattr(connection, 'released_at', None)
+        if released_at is not None and (
+            now - released_at < settings.DB_HEALTH_CHECK_IDLE
+        ):
+            continue
+        if not connection.is_usable():
+            connection.close()
+
+
+def release_connections(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        connection.released_at = now
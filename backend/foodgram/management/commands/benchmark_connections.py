@@ -0,0 +1,58 @@
+import time
+from statistics import median, quantiles
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку запросов к базе с подключением на каждый '
+            'запрос и с переиспользованием подключений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Число запросов в каждом режиме.',
+        )
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы данных из DATABASES.',
+        )
+
+    def measure(self, connection, max_age, count):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        return timings
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        max_age = connection.settings_dict['CONN_MAX_AGE']
+        try:
+            for title, value in (
+                ('подключение на запрос', 0),
+                ('переиспользование', max_age or None),
+            ):
+                timings = self.measure(
+                    connection, value, max(options['requests'], 2)
+                )
+                self.stdout.write(
+                    f'{title} (CONN_MAX_AGE={value}): '
+                    f'медиана {median(timings):.2f} мс, '
+                    f'p95 {quantiles(timings, n=20)[-1]:.2f} мс'
+                )
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
@@ -19,10 +19,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
+    'foodgram',
     'api',
     'recipes',
     'users',
@@ -57,6 +59,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi').lower()
+
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', default='persistent').lower()
 
 DATABASES = {
     'default': {
@@ -66,6 +72,21 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='my_key_for_test'),
         'HOST': os.getenv('DB_HOST', default='db'),
         'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE',
+            default=0 if DB_POOL_MODE == 'none' else 60,
+        )),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
     }
 }
 
@@ -139,3 +160,49 @@ TRUE_SEARCH = ('1', 'true',)
 FALSE_SEARCH = ('0', 'false',)
 INGREDIENTS_MIN_AMOUNT = 1
 INGREDIENTS_MIN_AMOUNT_ERROR = ('Количество ингредиента не может быть меньше {min_amount}')
+
+INGREDIENT_CATALOG_CACHE = os.getenv(
+    'INGREDIENT_CATALOG_CACHE', default='true'
+).lower() in TRUE_SEARCH
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_SPOOL_SIZE = 1024 * 1024
+
+TRENDING_HALF_LIFE_DAYS = 3
+TRENDING_WINDOW_DAYS = 30
+
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 100
+FEED_BATCH_SIZE = 1000
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', default=1))
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=60))
+RESPONSE_CACHE_BETA = 1.0
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+RESPONSE_CACHE_WAIT = 2.0
+RESPONSE_CACHE_POLL = 0.05
+
+RECIPE_CACHE_TIMEOUT = 24 * 60 * 60
+USER_FLAGS_CACHE_TIMEOUT = 60 * 60
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+DB_HEALTH_CHECKS = DB_POOL_MODE != 'none' and os.getenv(
+    'DB_HEALTH_CHECKS', default='true'
+).lower() in TRUE_SEARCH
+DB_HEALTH_CHECK_IDLE = int(os.getenv('DB_HEALTH_CHECK_IDLE', default=30))
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+IMAGE_SPOOL_SIZE = 1024 * 1024
+RECIPE_IMAGE_SIZES = {
+    'thumb': 320,
+    'card': 640,
+    'full': 1600,
+}
+RECIPE_IMAGE_FORMAT = 'WEBP'
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
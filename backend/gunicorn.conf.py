@@ -0,0 +1,11 @@
+import os
+
+bind = '0:8000'
+if 'GUNICORN_WORKERS' in os.environ:
+    workers = int(os.environ['GUNICORN_WORKERS'])
+
+if os.getenv('SERVER_MODE', default='wsgi').lower() == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
@@ -50,7 +50,7 @@ class RecipeAdmin(DisplayEmptyFieldMixin, admin.ModelAdmin):
     exclude = ('tags', 'ingredients')
 
     def count_favorite(self, obj):
-        return obj.favorite_recipe.count()
+        return obj.favorites_count
 
 
 @admin.register(Favorites)
@@ -0,0 +1,31 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def increment(model, pk, field):
+    increment_all(model, (pk,), field)
+
+
+def decrement(model, pk, field):
+    decrement_all(model, (pk,), field)
+
+
+def increment_all(model, pks, field):
+    model.objects.filter(pk__in=pks).update(**{field: F(field) + 1})
+
+
+def decrement_all(model, pks, field):
+    model.objects.filter(pk__in=pks, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
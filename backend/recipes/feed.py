@@ -0,0 +1,167 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from heapq import merge
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from users.models import Subscription, User
+from .models import FeedEntry, Recipe
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def is_pulled(author):
+    return author.followers_count >= settings.FEED_FANOUT_LIMIT
+
+
+def push(author_id, recipes, user_ids):
+    batch = []
+    for user_id in user_ids:
+        for recipe_id, pub_date in recipes:
+            batch.append(FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            ))
+            if len(batch) == settings.FEED_BATCH_SIZE:
+                FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def followers(author_id):
+    return Subscription.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True).order_by().iterator()
+
+
+def latest_recipes(author_id):
+    return list(Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE])
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.select_related('author').filter(
+        id=recipe_id
+    ).first()
+    if recipe is None or is_pulled(recipe.author):
+        return
+    push(
+        recipe.author_id,
+        [(recipe.id, recipe.pub_date)],
+        followers(recipe.author_id),
+    )
+
+
+def backfill(user_id, author):
+    if is_pulled(author):
+        return
+    push(author.id, latest_recipes(author.id), (user_id,))
+
+
+def backfill_followers(author_id):
+    author = User.objects.filter(id=author_id).first()
+    if author is None or is_pulled(author):
+        return
+    push(author_id, latest_recipes(author_id), followers(author_id))
+
+
+def author_unfollowed(author_id):
+    followers_count = User.objects.filter(id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers_count == settings.FEED_FANOUT_LIMIT - 1:
+        transaction.on_commit(partial(schedule, backfill_followers, author_id))
+
+
+def run(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Не удалось обновить ленты подписчиков: %s%r',
+                         function.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.FEED_WORKERS,
+            thread_name_prefix='feed',
+        )
+    return _executor
+
+
+def schedule(function, *args):
+    if not settings.FEED_WORKERS:
+        function(*args)
+        return
+    get_executor().submit(run, function, *args)
+
+
+def forget(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def before(position, date_field, id_field):
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return Q(**{f'{date_field}__lte': pub_date}) & (
+        Q(**{f'{date_field}__lt': pub_date}) | Q(**{
+            date_field: pub_date,
+            f'{id_field}__lt': recipe_id,
+        })
+    )
+
+
+class Timeline:
+    model = Recipe
+
+    def __init__(self, user, queryset):
+        self.user = user
+        self.queryset = queryset
+
+    def pushed(self, position, size):
+        return FeedEntry.objects.filter(
+            before(position, 'pub_date', 'recipe_id'), user=self.user
+        ).order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:size]
+
+    def pulled(self, position, size):
+        authors = Subscription.objects.filter(
+            user=self.user,
+            author__followers_count__gte=settings.FEED_FANOUT_LIMIT,
+        ).values('author_id')
+        return Recipe.objects.filter(
+            before(position, 'pub_date', 'id'), author_id__in=authors
+        ).order_by('-pub_date', '-id').values_list('pub_date', 'id')[:size]
+
+    def page(self, position, size):
+        ids = []
+        seen = set()
+        for _, recipe_id in merge(
+            self.pushed(position, size),
+            self.pulled(position, size),
+            reverse=True,
+        ):
+            if recipe_id not in seen:
+                seen.add(recipe_id)
+                ids.append(recipe_id)
+            if len(ids) == size:
+                break
+        recipes = self.queryset.in_bulk(ids)
+        return [
+            recipes[recipe_id] for recipe_id in ids if recipe_id in recipes
+        ]
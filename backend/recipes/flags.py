@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import Subscription
+from .models import Favorites, ShoppingCart
+from .versions import bump_version, get_version
+
+USER_FLAGS_KEY = 'user-flags:{}:{}'
+USER_FLAGS_VERSION = 'user-flags-{}'
+
+
+def get_user_flags(user):
+    version = get_version(USER_FLAGS_VERSION.format(user.id))
+    key = USER_FLAGS_KEY.format(user.id, version)
+    flags = cache.get(key)
+    if flags is None:
+        flags = (
+            frozenset(Favorites.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )),
+            frozenset(ShoppingCart.objects.filter(user=user).values_list(
+                'recipe_id', flat=True
+            )),
+            frozenset(Subscription.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )),
+        )
+        cache.set(key, flags, settings.USER_FLAGS_CACHE_TIMEOUT)
+    return flags
+
+
+def forget_user_flags(user_id):
+    bump_version(USER_FLAGS_VERSION.format(user_id))
@@ -0,0 +1,117 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .media import collect, replace
+from .models import Recipe
+from .versions import bump_version
+
+VARIANTS = ('thumb', 'card', 'full')
+VARIANTS_DIR = 'recipes/variants'
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def variant_fields():
+    return [f'image_{variant}' for variant in VARIANTS]
+
+
+def get_output_format():
+    if settings.RECIPE_IMAGE_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(
+        buffer,
+        format=image_format,
+        quality=settings.RECIPE_IMAGE_QUALITY,
+        optimize=True,
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).only('id', 'image').first()
+    if recipe is None or not recipe.image:
+        return False
+    source = recipe.image.name
+    storage = recipe.image.storage
+    image_format, extension = get_output_format()
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        rendered = {
+            variant: render_variant(
+                image,
+                settings.RECIPE_IMAGE_SIZES[variant],
+                image_format,
+            )
+            for variant in VARIANTS
+        }
+    previous = Recipe.objects.filter(id=recipe_id, image=source).values(
+        *variant_fields()
+    ).first()
+    if previous is None:
+        return False
+    with transaction.atomic():
+        names = {
+            f'image_{variant}': storage.save(
+                f'{VARIANTS_DIR}/{variant}.{extension}', content
+            )
+            for variant, content in rendered.items()
+        }
+        updated = Recipe.objects.filter(
+            id=recipe_id, image=source, **previous
+        ).update(updated_at=timezone.now(), **names)
+        if updated:
+            replace(
+                [name for name in previous.values() if name],
+                list(names.values()),
+            )
+    if not updated:
+        collect(list(names.values()))
+        return False
+    bump_version('recipes')
+    return True
+
+
+def run_build(recipe_id):
+    try:
+        build_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось подготовить изображения рецепта %s',
+                         recipe_id)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def schedule_variants(recipe_id):
+    if not settings.RECIPE_IMAGE_WORKERS:
+        build_variants(recipe_id)
+        return
+    get_executor().submit(run_build, recipe_id)
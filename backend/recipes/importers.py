@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, transaction
+
+from .models import Ingredient, Tag
+
+JSON_READ_SIZE = 64 * 1024
+
+
+class RowError(Exception):
+    pass
+
+
+class FileFormatError(Exception):
+    pass
+
+
+def read_csv(file, fields):
+    for line, values in enumerate(csv.reader(file), start=1):
+        if line == 1 and [value.strip() for value in values] == fields:
+            continue
+        if len(values) != len(fields):
+            yield line, RowError(
+                f'ожидалось полей: {len(fields)}, получено: {len(values)}'
+            )
+            continue
+        yield line, dict(zip(fields, values))
+
+
+def read_json(file, fields):
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise FileFormatError('ожидался JSON-массив объектов')
+    buffer = buffer[1:]
+    number = 0
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_READ_SIZE)
+            if not chunk:
+                raise FileFormatError(
+                    f'некорректный JSON после объекта {number}'
+                ) from None
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        number += 1
+        if not isinstance(item, dict):
+            yield number, RowError('ожидался объект')
+            continue
+        yield number, {field: item.get(field, '') for field in fields}
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class BulkImporter:
+    def __init__(self, model, key, fields, version, using='default'):
+        self.model = model
+        self.key = key
+        self.fields = list(fields)
+        self.version = version
+        self.using = using
+
+    def validate(self, row):
+        if isinstance(row, RowError):
+            raise row
+        row = {field: str(value).strip() for field, value in row.items()}
+        try:
+            self.model(**row).clean_fields(exclude=('id',))
+        except ValidationError as error:
+            raise RowError('; '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in error.message_dict.items()
+            ))
+        return row
+
+    def upsert(self, rows):
+        rows = list({row[self.key]: row for row in rows}.values())
+        try:
+            with transaction.atomic(using=self.using):
+                return self.upsert_batch(rows)
+        except IntegrityError:
+            return self.upsert_rows(rows)
+
+    def upsert_rows(self, rows):
+        created = updated = 0
+        errors = []
+        for row in rows:
+            try:
+                with transaction.atomic(using=self.using):
+                    row_created, row_updated, _ = self.upsert_batch([row])
+            except IntegrityError as error:
+                errors.append((row[self.key], str(error).strip()))
+                continue
+            created += row_created
+            updated += row_updated
+        return created, updated, errors
+
+    def upsert_batch(self, rows):
+        if connections[self.using].vendor == 'postgresql':
+            return self.upsert_postgresql(rows)
+        return self.upsert_generic(rows)
+
+    def upsert_generic(self, rows):
+        manager = self.model.objects.db_manager(self.using)
+        existing = manager.in_bulk(
+            [row[self.key] for row in rows], field_name=self.key
+        )
+        to_create = []
+        to_update = []
+        for row in rows:
+            instance = existing.get(row[self.key])
+            if instance is None:
+                to_create.append(self.model(**row))
+            elif any(
+                getattr(instance, field) != value
+                for field, value in row.items()
+            ):
+                for field, value in row.items():
+                    setattr(instance, field, value)
+                to_update.append(instance)
+        manager.bulk_create(to_create)
+        other_fields = [field for field in self.fields if field != self.key]
+        if to_update and other_fields:
+            manager.bulk_update(to_update, other_fields)
+        return len(to_create), len(to_update), []
+
+    def upsert_postgresql(self, rows):
+        connection = connections[self.using]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ', '.join(quote(field) for field in self.fields)
+        other_fields = [field for field in self.fields if field != self.key]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[field] for field in self.fields])
+        buffer.seek(0)
+        if other_fields:
+            conflict = (
+                'DO UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})'.format(
+                    ', '.join(
+                        f'{quote(field)} = EXCLUDED.{quote(field)}'
+                        for field in other_fields
+                    ),
+                    ', '.join(
+                        f'{table}.{quote(field)}' for field in other_fields
+                    ),
+                    ', '.join(
+                        f'EXCLUDED.{quote(field)}' for field in other_fields
+                    ),
+                )
+            )
+        else:
+            conflict = 'DO NOTHING'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS "import_rows" '
+                f'ON COMMIT DROP AS SELECT {columns} FROM {table} '
+                'WITH NO DATA'
+            )
+            cursor.execute('TRUNCATE "import_rows"')
+            cursor.copy_expert(
+                f'COPY "import_rows" ({columns}) FROM STDIN WITH CSV',
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM "import_rows" '
+                f'ON CONFLICT ({quote(self.key)}) {conflict} '
+                'RETURNING (xmax = 0)'
+            )
+            results = [inserted for inserted, in cursor.fetchall()]
+        created = sum(results)
+        return created, len(results) - created, []
+
+
+IMPORTERS = {
+    'ingredient': (Ingredient, 'name', ('name', 'measurement_unit'),
+                   'ingredients'),
+    'tag': (Tag, 'slug', ('name', 'color', 'slug'), 'tags'),
+}
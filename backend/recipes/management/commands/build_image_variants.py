@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Готовит уменьшенные копии изображений рецептов '
+            '(thumb, card, full).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать копии у всех рецептов, а не только у тех, '
+                 'где их нет.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if not options['all']:
+            recipes = recipes.filter(image_thumb='')
+        built = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            built += build_variants(recipe_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлены изображения рецептов: {built}'
+        ))
@@ -0,0 +1,95 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from recipes.importers import (IMPORTERS, READERS, BulkImporter,
+                               FileFormatError, RowError)
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = ('Импортирует ингредиенты или теги из CSV или JSON пачками '
+            'в одной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV или JSON файлу.')
+        parser.add_argument(
+            '--model',
+            choices=sorted(IMPORTERS),
+            default='ingredient',
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Формат файла. По умолчанию определяется по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--print-errors',
+            action='store_true',
+            help='Печатать каждую ошибку подробно.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        importer = BulkImporter(
+            *IMPORTERS[options['model']], using=options['database']
+        )
+        self.print_errors = options['print_errors']
+        self.started = time.monotonic()
+        self.total = self.created = self.updated = self.errors = 0
+        try:
+            self.import_file(path, file_format, importer, options)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        except (FileFormatError, UnicodeDecodeError) as error:
+            raise CommandError(f'Некорректный файл {path}: {error}')
+        bump_version(importer.version)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Модель: {importer.model.__name__}. Строк: {self.total}; '
+            f'создано: {self.created}; обновлено: {self.updated}; '
+            f'ошибок: {self.errors}; {elapsed:.1f} с'
+        ))
+
+    def import_file(self, path, file_format, importer, options):
+        with open(path, encoding='utf-8', newline='') as file:
+            with transaction.atomic(using=options['database']):
+                batch = []
+                for line, row in READERS[file_format](file, importer.fields):
+                    self.total += 1
+                    try:
+                        batch.append(importer.validate(row))
+                    except RowError as error:
+                        self.report_error(f'строка {line}', error)
+                    if len(batch) >= options['batch_size']:
+                        self.flush(importer, batch)
+                        batch = []
+                self.flush(importer, batch)
+
+    def flush(self, importer, batch):
+        if not batch:
+            return
+        created, updated, errors = importer.upsert(batch)
+        self.created += created
+        self.updated += updated
+        for key, error in errors:
+            self.report_error(f'{importer.key}={key}', error)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'Обработано строк: {self.total} '
+            f'({self.total / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+
+    def report_error(self, row, error):
+        self.errors += 1
+        if self.print_errors:
+            self.stderr.write(f'Ошибка ({row}): {error}')
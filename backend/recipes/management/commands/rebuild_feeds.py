@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import latest_recipes, push
+from recipes.models import FeedEntry
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает ленты подписок по текущим подпискам, '
+            'например после потери фоновых задач при перезапуске.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Ограничиться одним пользователем.',
+        )
+
+    def handle(self, *args, **options):
+        user_id = options['user']
+        entries = FeedEntry.objects.all()
+        subscriptions = Subscription.objects.filter(
+            author__followers_count__lt=settings.FEED_FANOUT_LIMIT
+        )
+        if user_id is not None:
+            entries = entries.filter(user_id=user_id)
+            subscriptions = subscriptions.filter(user_id=user_id)
+        authors = 0
+        with transaction.atomic():
+            entries.delete()
+            for author_id in subscriptions.values_list(
+                'author_id', flat=True
+            ).order_by('author_id').distinct().iterator():
+                push(
+                    author_id,
+                    latest_recipes(author_id),
+                    subscriptions.filter(author_id=author_id).values_list(
+                        'user_id', flat=True
+                    ).order_by().iterator(),
+                )
+                authors += 1
+            created = entries.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, авторов: {authors}, записей: {created}'
+        ))
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает или проверяет агрегированные списки покупок '
+            'по содержимому корзин.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с корзинами, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Ограничиться одним пользователем.',
+        )
+
+    def get_live_totals(self, user_id):
+        rows = IngredientInRecipe.objects.filter(
+            recipe__shopping_cart_recipe__isnull=False
+        )
+        if user_id is not None:
+            rows = rows.filter(recipe__shopping_cart_recipe__user=user_id)
+        return rows.values_list(
+            'recipe__shopping_cart_recipe__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by().iterator()
+
+    def get_stored_items(self, user_id):
+        items = ShoppingListItem.objects.filter(total_amount__gt=0)
+        if user_id is not None:
+            items = items.filter(user_id=user_id)
+        return items
+
+    def handle(self, *args, **options):
+        user_id = options['user']
+        if options['verify']:
+            self.verify(user_id)
+        else:
+            self.rebuild(user_id)
+
+    def rebuild(self, user_id):
+        with transaction.atomic():
+            items = ShoppingListItem.objects.all()
+            if user_id is not None:
+                items = items.filter(user_id=user_id)
+            items.delete()
+            batch = []
+            created = 0
+            for user, ingredient, total in self.get_live_totals(user_id):
+                batch.append(ShoppingListItem(
+                    user_id=user,
+                    ingredient_id=ingredient,
+                    total_amount=total,
+                ))
+                if len(batch) == BATCH_SIZE:
+                    ShoppingListItem.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            ShoppingListItem.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, позиций: {created}'
+        ))
+
+    def verify(self, user_id):
+        stored = dict(
+            ((user, ingredient), total)
+            for user, ingredient, total in self.get_stored_items(
+                user_id
+            ).values_list('user_id', 'ingredient_id', 'total_amount')
+        )
+        mismatches = 0
+        for user, ingredient, total in self.get_live_totals(user_id):
+            stored_total = stored.pop((user, ingredient), 0)
+            if stored_total != total:
+                mismatches += 1
+                self.stdout.write(
+                    f'user={user} ingredient={ingredient}: '
+                    f'в таблице {stored_total}, в корзинах {total}'
+                )
+        for (user, ingredient), total in stored.items():
+            mismatches += 1
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'в таблице {total}, в корзинах 0'
+            )
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет'))
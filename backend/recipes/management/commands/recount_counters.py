@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.counters import count_subquery
+from recipes.models import Favorites, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorites, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет и исправляет счётчики избранного, корзин, рецептов '
+            'и подписчиков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения.',
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related, related_field in COUNTERS:
+            actual = count_subquery(related, related_field)
+            drifted = list(
+                model.objects.annotate(actual=actual).exclude(
+                    **{field: F('actual')}
+                ).values_list('pk', field, 'actual')
+            )
+            for pk, stored, real in drifted:
+                self.stdout.write(
+                    f'{model.__name__}({pk}).{field}: {stored} -> {real}'
+                )
+            if drifted and not options['dry_run']:
+                model.objects.filter(
+                    pk__in=[pk for pk, _, _ in drifted]
+                ).update(**{field: actual})
+            self.stdout.write(
+                f'{model.__name__}.{field}: расхождений {len(drifted)}'
+            )
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from recipes.models import Favorites, Recipe
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает trending_score рецептов: число добавлений '
+            'в избранное с экспоненциальным затуханием по времени.')
+
+    def get_scores(self):
+        today = timezone.localdate()
+        since = timezone.now() - timezone.timedelta(
+            days=settings.TRENDING_WINDOW_DAYS
+        )
+        daily = Favorites.objects.filter(created__gte=since).annotate(
+            day=TruncDate('created')
+        ).values_list('recipe_id', 'day').annotate(
+            total=Count('id')
+        ).order_by()
+        scores = {}
+        for recipe_id, day, total in daily.iterator():
+            age = (today - day).days
+            scores[recipe_id] = scores.get(recipe_id, 0) + total * 0.5 ** (
+                age / settings.TRENDING_HALF_LIFE_DAYS
+            )
+        return scores
+
+    def handle(self, *args, **options):
+        scores = self.get_scores()
+        with transaction.atomic():
+            reset = Recipe.objects.filter(trending_score__gt=0).exclude(
+                id__in=scores
+            ).update(trending_score=0)
+            recipes = []
+            for recipe in Recipe.objects.filter(id__in=scores).only(
+                'id', 'trending_score'
+            ).iterator():
+                score = round(scores[recipe.id], 6)
+                if recipe.trending_score != score:
+                    recipe.trending_score = score
+                    recipes.append(recipe)
+            Recipe.objects.bulk_update(
+                recipes, ('trending_score',), batch_size=BATCH_SIZE
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {len(recipes)}; обнулено: {reset}'
+        ))
@@ -0,0 +1,70 @@
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, ImageField
+from django.db.models.functions import Greatest
+
+from .models import MediaBlob, Recipe
+from .storage import media_storage
+
+MEDIA_FIELDS = tuple(
+    field.name for field in Recipe._meta.fields
+    if isinstance(field, ImageField)
+)
+
+
+def media_names(recipe):
+    return [
+        getattr(recipe, field).name for field in MEDIA_FIELDS
+        if getattr(recipe, field)
+    ]
+
+
+def stored_media_names(recipe_id):
+    row = Recipe.objects.filter(id=recipe_id).values_list(
+        *MEDIA_FIELDS
+    ).first()
+    return [name for name in row or () if name]
+
+
+def acquire(names):
+    counts = Counter(names)
+    if not counts:
+        return
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name) for name in counts],
+        ignore_conflicts=True,
+    )
+    for name, count in counts.items():
+        MediaBlob.objects.filter(name=name).update(
+            references=F('references') + count
+        )
+
+
+def release(names):
+    counts = Counter(names)
+    if not counts:
+        return
+    for name, count in counts.items():
+        MediaBlob.objects.filter(name=name).update(
+            references=Greatest(F('references') - count, 0)
+        )
+    transaction.on_commit(partial(collect, list(counts)))
+
+
+def replace(old_names, new_names):
+    old_names = Counter(old_names)
+    new_names = Counter(new_names)
+    acquire((new_names - old_names).elements())
+    release((old_names - new_names).elements())
+
+
+def collect(names):
+    with transaction.atomic():
+        collected = list(MediaBlob.objects.select_for_update().filter(
+            name__in=names, references=0
+        ).order_by('name').values_list('name', flat=True))
+        MediaBlob.objects.filter(name__in=collected).delete()
+        for name in collected:
+            media_storage.delete(name)
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.16 on 2026-10-17 04:07
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = 'recipes_recipe_search_vector_gin'
+SEARCH_CONFIG = 'russian'
+SEARCH_VECTOR_SQL = '''
+UPDATE "recipes_recipe" SET "search_vector" =
+    setweight(to_tsvector(%s::regconfig, "name"), 'A')
+    || setweight(to_tsvector(%s::regconfig, COALESCE((
+        SELECT string_agg("recipes_ingredient"."name", ' ')
+        FROM "recipes_ingredientinrecipe"
+        INNER JOIN "recipes_ingredient"
+            ON "recipes_ingredient"."id"
+            = "recipes_ingredientinrecipe"."ingredient_id"
+        WHERE "recipes_ingredientinrecipe"."recipe_id"
+            = "recipes_recipe"."id"
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, "text"), 'C')
+'''
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(SEARCH_VECTOR_SQL, (SEARCH_CONFIG,) * 3)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{INDEX_NAME}" '
+        'ON "recipes_recipe" USING gin ("search_vector")'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{INDEX_NAME}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def copy_tags(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TagInRecipe = apps.get_model('recipes', 'TagInRecipe')
+    keep = TagInRecipe.objects.values('recipe', 'tag').annotate(
+        keep=Min('id')
+    ).values_list('keep', flat=True)
+    TagInRecipe.objects.exclude(id__in=list(keep)).delete()
+    existing = set(TagInRecipe.objects.values_list('recipe_id', 'tag_id'))
+    TagInRecipe.objects.bulk_create(
+        (
+            TagInRecipe(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id'
+            ).iterator()
+            if (recipe_id, tag_id) not in existing
+        ),
+        batch_size=1000,
+    )
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_tags, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='tags',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags',
+            field=models.ManyToManyField(related_name='recipes', through='recipes.TagInRecipe', to='recipes.Tag'),
+        ),
+        migrations.AddIndex(
+            model_name='taginrecipe',
+            index=models.Index(fields=['tag', 'recipe'], name='tag_in_recipe_tag_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taginrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique_tag_in_recipe'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.16 on 2026-10-17 04:18
+
+from collections import Counter
+
+from django.db import migrations, models
+import recipes.storage
+
+MEDIA_FIELDS = ('image', 'image_thumb', 'image_card', 'image_full')
+
+
+def count_references(apps, schema_editor):
+    MediaBlob = apps.get_model('recipes', 'MediaBlob')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    references = Counter()
+    for names in Recipe.objects.values_list(*MEDIA_FIELDS).iterator():
+        references.update(name for name in names if name)
+    MediaBlob.objects.bulk_create(
+        [
+            MediaBlob(name=name, references=count)
+            for name, count in references.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_card',
+            field=models.ImageField(blank=True, editable=False, storage=recipes.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_full',
+            field=models.ImageField(blank=True, editable=False, storage=recipes.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_thumb',
+            field=models.ImageField(blank=True, editable=False, storage=recipes.storage.ContentAddressedStorage(), upload_to=''),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,41 @@
+from functools import partial
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db.models import (CASCADE, CharField, DateTimeField, ForeignKey,
-                              ImageField, ManyToManyField, Model,
-                              PositiveSmallIntegerField, SlugField, TextField,
-                              UniqueConstraint)
-from foodgram.settings import MAX_LEN_RECIPES_CHARFIELD
+from django.db import connections, transaction
+from django.db.models import (CASCADE, BigIntegerField, BooleanField, Case,
+                              CharField, DateTimeField, Exists, F, FloatField,
+                              ForeignKey, ImageField, Index, IntegerField,
+                              ManyToManyField, Model, OuterRef,
+                              PositiveIntegerField, PositiveSmallIntegerField,
+                              Prefetch, QuerySet, SlugField, Sum, TextField,
+                              UniqueConstraint, Value, When, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from foodgram.settings import MAX_LEN_RECIPES_CHARFIELD, RECIPE_SEARCH_CONFIG
+from users.models import Subscription
+from .storage import media_storage
+from .versions import bump_version
 
 User = get_user_model()
 
+SEARCH_VECTOR_SQL = '''
+UPDATE "recipes_recipe" SET "search_vector" =
+    setweight(to_tsvector(%s::regconfig, "name"), 'A')
+    || setweight(to_tsvector(%s::regconfig, COALESCE((
+        SELECT string_agg("recipes_ingredient"."name", ' ')
+        FROM "recipes_ingredientinrecipe"
+        INNER JOIN "recipes_ingredient"
+            ON "recipes_ingredient"."id"
+            = "recipes_ingredientinrecipe"."ingredient_id"
+        WHERE "recipes_ingredientinrecipe"."recipe_id"
+            = "recipes_recipe"."id"
+    ), '')), 'B')
+    || setweight(to_tsvector(%s::regconfig, "text"), 'C')
+WHERE "id" IN ({})
+'''
+
 
 class Tag(Model):
     name = CharField(
@@ -41,9 +69,78 @@ class Ingredient(Model):
         return f'{self.name} {self.measurement_unit}'
 
 
+def recipe_prefetches():
+    return (
+        'tags',
+        Prefetch(
+            'ingredient_recipe',
+            queryset=IngredientInRecipe.objects.select_related('ingredient'),
+        ),
+    )
+
+
+class RecipeQuerySet(QuerySet):
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            *recipe_prefetches()
+        )
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(
+                    False, output_field=BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorites.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def latest_per_author(self, author_ids, limit=None):
+        author_ids = list(author_ids)
+        if not author_ids:
+            return self.none()
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is not None:
+            ranked = recipes.annotate(row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )).values('id', 'row_number')
+            sql, params = ranked.query.sql_with_params()
+            recipes = self.filter(id__in=RawSQL(
+                f'SELECT "id" FROM ({sql}) AS "ranked" '
+                'WHERE "row_number" <= %s',
+                (*params, limit),
+            ))
+        return recipes.order_by('author_id', '-pub_date', '-id')
+
+    def update_search_vector(self):
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            return
+        sql, params = self.values('id').order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEARCH_VECTOR_SQL.format(sql),
+                (*(RECIPE_SEARCH_CONFIG,) * 3, *params),
+            )
+
+
 class Recipe(Model):
     tags = ManyToManyField(
         Tag,
+        through='TagInRecipe',
         related_name='recipes',
     )
     author = ForeignKey(
@@ -56,7 +153,22 @@ class Recipe(Model):
         related_name='recipes',
         through='recipes.IngredientInRecipe',
     )
-    image = ImageField(upload_to='recipes/')
+    image = ImageField(upload_to='recipes/', storage=media_storage)
+    image_thumb = ImageField(
+        blank=True,
+        editable=False,
+        storage=media_storage,
+    )
+    image_card = ImageField(
+        blank=True,
+        editable=False,
+        storage=media_storage,
+    )
+    image_full = ImageField(
+        blank=True,
+        editable=False,
+        storage=media_storage,
+    )
     name = CharField(
         max_length=MAX_LEN_RECIPES_CHARFIELD,
     )
@@ -70,9 +182,52 @@ class Recipe(Model):
     pub_date = DateTimeField(
         auto_now_add=True,
     )
+    updated_at = DateTimeField(
+        auto_now=True,
+    )
+    favorites_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    in_carts_count = PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    trending_score = FloatField(
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = (
+            Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx',
+            ),
+            Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx',
+            ),
+            Index(
+                fields=('cooking_time', '-id'),
+                name='recipe_cooking_time_idx',
+            ),
+            Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
         constraints = (
             UniqueConstraint(
                 fields=('name', 'author'),
@@ -125,6 +280,18 @@ class TagInRecipe(Model):
     class Meta:
         verbose_name = 'Тег рецепта'
         verbose_name_plural = 'Теги рецептов'
+        indexes = (
+            Index(
+                fields=('tag', 'recipe'),
+                name='tag_in_recipe_tag_idx',
+            ),
+        )
+        constraints = (
+            UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='unique_tag_in_recipe'
+            ),
+        )
 
     def __str__(self):
         return f'{self.tag.name} для рецепта {self.recipe.name}'
@@ -141,6 +308,10 @@ class Favorites(Model):
         on_delete=CASCADE,
         related_name='favorite_recipe'
     )
+    created = DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         constraints = (
@@ -176,3 +347,183 @@ class ShoppingCart(Model):
 
     def __str__(self):
         return f'{self.user} добавил в корзину {self.recipe}'
+
+
+SHOPPING_LIST_LOCK_ATTEMPTS = 3
+
+
+class ShoppingListItemQuerySet(QuerySet):
+    def apply_deltas(self, user_ids, deltas):
+        user_ids = list(user_ids)
+        deltas = {
+            ingredient_id: amount
+            for ingredient_id, amount in deltas.items() if amount
+        }
+        if not user_ids or not deltas:
+            return
+        expected = {
+            (user_id, ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, amount in deltas.items() if amount > 0
+        }
+        with transaction.atomic():
+            items = self.filter(
+                user_id__in=user_ids,
+                ingredient_id__in=deltas,
+            )
+            for attempt in range(1, SHOPPING_LIST_LOCK_ATTEMPTS + 1):
+                missing = expected - set(
+                    items.select_for_update().order_by(
+                        'user_id', 'ingredient_id'
+                    ).values_list('user_id', 'ingredient_id')
+                )
+                if not missing:
+                    break
+                self.bulk_create(
+                    [
+                        ShoppingListItem(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=0,
+                        )
+                        for user_id, ingredient_id in sorted(missing)
+                    ],
+                    ignore_conflicts=attempt < SHOPPING_LIST_LOCK_ATTEMPTS,
+                )
+            items.update(total_amount=F('total_amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in deltas.items()
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+            items.filter(total_amount__lte=0).delete()
+
+    def add_recipe(self, user_id, recipe_id):
+        self.add_recipes(user_id, (recipe_id,))
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.remove_recipes(user_id, (recipe_id,))
+
+    def add_recipes(self, user_id, recipe_ids):
+        self.apply_deltas((user_id,), recipe_amounts(recipe_ids))
+
+    def remove_recipes(self, user_id, recipe_ids):
+        self.apply_deltas((user_id,), {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(recipe_ids).items()
+        })
+
+
+def recipe_amounts(recipe_ids):
+    return dict(IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id').annotate(total=Sum('amount')).order_by())
+
+
+class ShoppingListItem(Model):
+    user = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = ForeignKey(
+        Ingredient,
+        on_delete=CASCADE,
+        related_name='shopping_list',
+    )
+    total_amount = IntegerField(default=0)
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return (f'{self.user}: {self.ingredient.name} - '
+                f'{self.total_amount} {self.ingredient.measurement_unit}')
+
+
+class FeedEntry(Model):
+    user = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='feed',
+    )
+    recipe = ForeignKey(
+        Recipe,
+        on_delete=CASCADE,
+        related_name='feed_entries',
+    )
+    author = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        related_name='+',
+    )
+    pub_date = DateTimeField()
+
+    class Meta:
+        indexes = (
+            Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_entry_timeline_idx',
+            ),
+            Index(
+                fields=('user', 'author'),
+                name='feed_entry_author_idx',
+            ),
+        )
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} в ленте {self.user_id}'
+
+
+class MediaBlob(Model):
+    name = CharField(
+        max_length=100,
+        unique=True,
+    )
+    references = PositiveIntegerField(
+        default=0,
+    )
+
+    def __str__(self):
+        return f'{self.name}: ссылок {self.references}'
+
+
+RECIPE_CHANGES_VERSION = 'recipe-changes'
+
+
+class RecipeChangeQuerySet(QuerySet):
+    def record(self, recipe_ids):
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return
+        self.bulk_create(
+            RecipeChange(recipe_id=recipe_id) for recipe_id in recipe_ids
+        )
+        transaction.on_commit(partial(bump_version, RECIPE_CHANGES_VERSION))
+
+
+class RecipeChange(Model):
+    recipe_id = BigIntegerField()
+    created = DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = RecipeChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f'{self.id}: рецепт {self.recipe_id}'
@@ -0,0 +1,200 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from users.models import Subscription, User
+from . import feed
+from .counters import decrement, increment
+from .flags import forget_user_flags
+from .media import (MEDIA_FIELDS, media_names, release, replace,
+                    stored_media_names)
+from .models import (Favorites, Ingredient, IngredientInRecipe, Recipe,
+                     RecipeChange, ShoppingCart, ShoppingListItem, Tag)
+from .versions import bump_version
+
+AUTHOR_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+SEARCH_FIELDS = {'name', 'text'}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+        increment(Recipe, instance.recipe_id, 'in_carts_count')
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+    decrement(Recipe, instance.recipe_id, 'in_carts_count')
+
+
+def apply_cart_deltas(recipe_id, deltas):
+    ShoppingListItem.objects.apply_deltas(
+        ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        ),
+        deltas,
+    )
+
+
+@receiver(pre_save, sender=IngredientInRecipe)
+def recipe_ingredient_loaded(sender, instance, **kwargs):
+    if instance.pk:
+        instance._stored_amount = IngredientInRecipe.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe_id', 'ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    stored = instance.__dict__.pop('_stored_amount', None)
+    deltas = {instance.ingredient_id: instance.amount}
+    if stored is not None:
+        recipe_id, ingredient_id, amount = stored
+        if recipe_id == instance.recipe_id:
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+        else:
+            apply_cart_deltas(recipe_id, {ingredient_id: -amount})
+    apply_cart_deltas(instance.recipe_id, deltas)
+
+
+@receiver(post_delete, sender=IngredientInRecipe)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    apply_cart_deltas(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(post_save, sender=Favorites)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        increment(Recipe, instance.recipe_id, 'favorites_count')
+
+
+@receiver(post_delete, sender=Favorites)
+def favorite_deleted(sender, instance, **kwargs):
+    decrement(Recipe, instance.recipe_id, 'favorites_count')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    transaction.on_commit(partial(bump_version, 'recipes'))
+    if created:
+        increment(User, instance.author_id, 'recipes_count')
+        transaction.on_commit(
+            partial(feed.schedule, feed.fan_out, instance.id)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_version, 'recipes'))
+    decrement(User, instance.author_id, 'recipes_count')
+    RecipeChange.objects.record((instance.id,))
+
+
+def tracks_media(update_fields):
+    return update_fields is None or bool(
+        set(MEDIA_FIELDS).intersection(update_fields)
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_media_loaded(sender, instance, update_fields, **kwargs):
+    if instance.pk and tracks_media(update_fields):
+        instance._stored_media = stored_media_names(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_media_saved(sender, instance, update_fields, **kwargs):
+    if tracks_media(update_fields):
+        replace(
+            instance.__dict__.pop('_stored_media', ()),
+            media_names(instance),
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_media_deleted(sender, instance, **kwargs):
+    release(media_names(instance))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(partial(bump_version, 'recipes'))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS.intersection(update_fields):
+        transaction.on_commit(partial(bump_version, 'recipes'))
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    feed.forget(instance.user_id, instance.author_id)
+
+
+@receiver((post_save, post_delete), sender=Favorites)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def user_flags_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(forget_user_flags, instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, 'ingredients'))
+
+
+@receiver(pre_save, sender=Ingredient)
+def ingredient_name_loaded(sender, instance, update_fields, **kwargs):
+    if instance.pk and (update_fields is None or 'name' in update_fields):
+        instance._stored_name = Ingredient.objects.filter(
+            pk=instance.pk
+        ).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    stored_name = instance.__dict__.pop('_stored_name', instance.name)
+    if not created and stored_name != instance.name:
+        Recipe.objects.filter(
+            ingredients=instance
+        ).update_search_vector()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_saved(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields is None or SEARCH_FIELDS.intersection(
+        update_fields
+    ):
+        Recipe.objects.filter(id=instance.id).update_search_vector()
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(id=instance.recipe_id).update_search_vector()
+    RecipeChange.objects.record((instance.recipe_id,))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    transaction.on_commit(partial(bump_version, 'tags'))
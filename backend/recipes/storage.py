@@ -0,0 +1,43 @@
+import hashlib
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_digest(self, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def get_content_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = self.get_digest(content)
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        blobs = apps.get_model('recipes', 'MediaBlob').objects
+        with transaction.atomic():
+            blobs.bulk_create(
+                [blobs.model(name=name)], ignore_conflicts=True
+            )
+            list(blobs.select_for_update().filter(name=name).values('id'))
+            if self.exists(name):
+                return name
+            return super().save(name, content, max_length=max_length)
+
+
+media_storage = ContentAddressedStorage()
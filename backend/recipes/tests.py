@@ -0,0 +1,392 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from functools import partial
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import Subscription, User
+from .flags import forget_user_flags, get_user_flags
+from .media import collect
+from .models import (Favorites, FeedEntry, Ingredient, IngredientInRecipe,
+                     MediaBlob, Recipe, RecipeQuerySet, ShoppingCart,
+                     ShoppingListItem)
+from .storage import media_storage
+
+
+class ImportDataTest(TestCase):
+    def import_json(self, content):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8', delete=False
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        call_command('import_data', file.name, stdout=io.StringIO())
+
+    def test_imports_json(self):
+        self.import_json(
+            '[{"name": "соль", "measurement_unit": "г"}, '
+            '{"name": "вода", "measurement_unit": "мл"}]'
+        )
+        self.assertEqual(Ingredient.objects.count(), 2)
+
+    def test_broken_json_raises_command_error(self):
+        for content in (
+            '[{"name": "соль", "measurement_unit": "г"}, {"name": ',
+            '{"name": "соль"}',
+        ):
+            with self.subTest(content=content):
+                with self.assertRaises(CommandError):
+                    self.import_json(content)
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_missing_file_raises_command_error(self):
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'missing.json')
+
+
+class ShoppingListItemTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+        )
+        cls.salt = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        cls.water = Ingredient.objects.create(
+            name='вода', measurement_unit='мл'
+        )
+
+    def amounts(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient__name', 'total_amount'))
+
+    def test_apply_deltas_creates_updates_and_deletes_rows(self):
+        items = ShoppingListItem.objects
+        items.apply_deltas((self.user.id,), {self.salt.id: 5})
+        items.apply_deltas(
+            (self.user.id,), {self.salt.id: 3, self.water.id: 100}
+        )
+        self.assertEqual(self.amounts(), {'соль': 8, 'вода': 100})
+        items.apply_deltas(
+            (self.user.id,), {self.salt.id: -8, self.water.id: -40}
+        )
+        self.assertEqual(self.amounts(), {'вода': 60})
+
+    def test_apply_deltas_recreates_a_row_deleted_before_locking(self):
+        items = ShoppingListItem.objects
+        items.apply_deltas((self.user.id,), {self.salt.id: 5})
+        items.filter(user=self.user).delete()
+        items.apply_deltas((self.user.id,), {self.salt.id: 2})
+        self.assertEqual(self.amounts(), {'соль': 2})
+
+    def create_recipe_in_cart(self):
+        recipe = Recipe.objects.create(
+            author=self.user,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=1,
+            image='recipes/test.png',
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=self.salt, amount=5
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        return recipe
+
+    def test_recipe_ingredient_edits_update_carts(self):
+        recipe = self.create_recipe_in_cart()
+        self.assertEqual(self.amounts(), {'соль': 5})
+        item = IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=self.water, amount=100
+        )
+        self.assertEqual(self.amounts(), {'соль': 5, 'вода': 100})
+        item.amount = 150
+        item.save()
+        self.assertEqual(self.amounts(), {'соль': 5, 'вода': 150})
+        item.ingredient = self.salt
+        item.save()
+        self.assertEqual(self.amounts(), {'соль': 155})
+        item.delete()
+        self.assertEqual(self.amounts(), {'соль': 5})
+
+    def test_deleting_recipe_in_cart_clears_list_once(self):
+        recipe = self.create_recipe_in_cart()
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=self.water, amount=100
+        )
+        ShoppingListItem.objects.apply_deltas(
+            (self.user.id,), {self.salt.id: 1}
+        )
+        recipe.delete()
+        self.assertEqual(self.amounts(), {'соль': 1})
+
+
+@override_settings(FEED_FANOUT_LIMIT=3, FEED_WORKERS=0)
+class FeedModeSwitchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{index}',
+                email=f'reader{index}@example.com',
+                password='pass',
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        for reader in self.readers:
+            Subscription.objects.create(user=reader, author=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                author=self.author,
+                name='Рецепт',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+
+    def test_pulled_author_is_not_fanned_out(self):
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_switch_to_push_backfills_followers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.get(
+                user=self.readers[0], author=self.author
+            ).delete()
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user_id', 'recipe_id')),
+            {(reader.id, self.recipe.id) for reader in self.readers[1:]},
+        )
+
+    def test_pushed_author_is_fanned_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.get(
+                user=self.readers[0], author=self.author
+            ).delete()
+            recipe = Recipe.objects.create(
+                author=self.author,
+                name='Новый рецепт',
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+        self.assertEqual(
+            FeedEntry.objects.filter(recipe=recipe).count(), 2
+        )
+
+    def test_rebuild_feeds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.get(
+                user=self.readers[0], author=self.author
+            ).delete()
+        FeedEntry.objects.all().delete()
+        FeedEntry.objects.create(
+            user=self.readers[0],
+            recipe=self.recipe,
+            author=self.author,
+            pub_date=self.recipe.pub_date,
+        )
+        call_command(
+            'rebuild_feeds', '--user', self.readers[1].id,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user_id', flat=True)),
+            {self.readers[0].id, self.readers[1].id},
+        )
+        call_command('rebuild_feeds', stdout=io.StringIO())
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user_id', 'recipe_id')),
+            {(reader.id, self.recipe.id) for reader in self.readers[1:]},
+        )
+
+
+class UserFlagsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=1,
+            image='recipes/test.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_change_committed_during_read_is_not_cached(self):
+        set_flags = cache.set
+
+        def commit_before_set(key, *args):
+            if key.startswith('user-flags:'):
+                Favorites.objects.create(user=self.user, recipe=self.recipe)
+                forget_user_flags(self.user.id)
+            set_flags(key, *args)
+
+        with mock.patch.object(cache, 'set', commit_before_set):
+            favorites, _, _ = get_user_flags(self.user)
+        self.assertEqual(favorites, frozenset())
+        favorites, _, _ = get_user_flags(self.user)
+        self.assertEqual(favorites, {self.recipe.id})
+
+
+class MediaCollectTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save(self, content):
+        return media_storage.save('recipes/file.txt', ContentFile(content))
+
+    def test_save_registers_existing_content(self):
+        name = self.save(b'one')
+        MediaBlob.objects.filter(name=name).delete()
+        self.assertEqual(self.save(b'one'), name)
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+
+    def test_collect_deletes_only_its_own_unreferenced_rows(self):
+        unused, used, untracked = (
+            self.save(content) for content in (b'one', b'two', b'three')
+        )
+        MediaBlob.objects.filter(name=used).update(references=1)
+        MediaBlob.objects.filter(name=untracked).delete()
+        collect([unused, used, untracked])
+        self.assertFalse(media_storage.exists(unused))
+        self.assertTrue(media_storage.exists(used))
+        self.assertTrue(media_storage.exists(untracked))
+        self.assertEqual(
+            list(MediaBlob.objects.values_list('name', flat=True)), [used]
+        )
+
+
+class SearchVectorSignalTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=1,
+            image='recipes/test.png',
+        )
+
+    def refreshed(self, change):
+        with mock.patch.object(
+            RecipeQuerySet, 'update_search_vector', autospec=True
+        ) as update:
+            change()
+        return [
+            set(call.args[0].values_list('id', flat=True))
+            for call in update.call_args_list
+        ]
+
+    def test_orm_writes_refresh_the_vector(self):
+        recipe_ids = {self.recipe.id}
+
+        def add_ingredient():
+            IngredientInRecipe.objects.create(
+                recipe=self.recipe, ingredient=self.ingredient, amount=1
+            )
+
+        self.assertEqual(self.refreshed(add_ingredient), [recipe_ids])
+        self.assertEqual(
+            self.refreshed(IngredientInRecipe.objects.get().delete),
+            [recipe_ids],
+        )
+        self.recipe.text = 'Другой текст'
+        self.assertEqual(self.refreshed(self.recipe.save), [recipe_ids])
+        self.assertEqual(self.refreshed(partial(
+            self.recipe.save, update_fields=['cooking_time']
+        )), [])
+
+    def test_only_renaming_an_ingredient_refreshes_recipes(self):
+        IngredientInRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1
+        )
+        self.ingredient.measurement_unit = 'кг'
+        self.assertEqual(self.refreshed(self.ingredient.save), [])
+        self.ingredient.name = 'морская соль'
+        self.assertEqual(
+            self.refreshed(self.ingredient.save), [{self.recipe.id}]
+        )
+
+
+class UpdateTrendingTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f'fan{index}',
+                email=f'fan{index}@example.com',
+                password='pass',
+            )
+            for index in range(5)
+        ]
+        self.fresh, self.old, self.backfilled = (
+            Recipe.objects.create(
+                author=self.users[0],
+                name=name,
+                text='Текст',
+                cooking_time=1,
+                image='recipes/test.png',
+            )
+            for name in ('Свежий', 'Старый', 'Перенесённый')
+        )
+        now = timezone.now()
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        for recipe, fans, created in (
+            (self.fresh, 2, now),
+            (self.old, 4, now - timedelta(days=10)),
+            (self.backfilled, 5, epoch),
+        ):
+            for user in self.users[:fans]:
+                favorite = Favorites.objects.create(user=user, recipe=recipe)
+                Favorites.objects.filter(id=favorite.id).update(
+                    created=created
+                )
+        Recipe.objects.filter(id=self.backfilled.id).update(trending_score=7)
+
+    def test_recent_favorites_rank_higher(self):
+        call_command('update_trending', stdout=io.StringIO())
+        scores = dict(Recipe.objects.values_list('id', 'trending_score'))
+        self.assertAlmostEqual(scores[self.fresh.id], 2)
+        self.assertAlmostEqual(
+            scores[self.old.id], 4 * 0.5 ** (10 / 3), places=5
+        )
+        self.assertEqual(scores[self.backfilled.id], 0)
+        self.assertEqual(
+            list(Recipe.objects.order_by(
+                '-trending_score', '-id'
+            ).values_list('id', flat=True)),
+            [self.fresh.id, self.old.id, self.backfilled.id],
+        )
+        self.assertEqual(
+            list(Recipe.objects.order_by('-favorites_count', '-id')[:1]),
+            [self.backfilled],
+        )
@@ -0,0 +1,136 @@
+from functools import partial
+
+from django.db import connections, transaction
+
+from .counters import decrement_all, increment_all
+from .flags import forget_user_flags
+from .models import Favorites, Recipe, ShoppingCart, ShoppingListItem
+
+
+class RecipeToggle:
+    def __init__(self, model, counter):
+        self.model = model
+        self.counter = counter
+
+    @property
+    def connection(self):
+        return connections[self.model.objects.db]
+
+    def add(self, user_id, recipe_ids):
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        with transaction.atomic():
+            added = sorted(self.insert(user_id, recipe_ids))
+            if added:
+                self.added(user_id, added)
+        return added
+
+    def remove(self, user_id, recipe_ids):
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        with transaction.atomic():
+            removed = sorted(self.delete(user_id, recipe_ids))
+            if removed:
+                self.removed(user_id, removed)
+        return removed
+
+    def added(self, user_id, recipe_ids):
+        increment_all(Recipe, recipe_ids, self.counter)
+        transaction.on_commit(partial(forget_user_flags, user_id))
+
+    def removed(self, user_id, recipe_ids):
+        decrement_all(Recipe, recipe_ids, self.counter)
+        transaction.on_commit(partial(forget_user_flags, user_id))
+
+    def extra_columns(self, user_id):
+        instance = self.model(user_id=user_id)
+        return [
+            (
+                field.column,
+                field.get_db_prep_save(
+                    field.pre_save(instance, True), self.connection
+                ),
+            )
+            for field in self.model._meta.concrete_fields
+            if not field.primary_key
+            and field.attname not in ('user_id', 'recipe_id')
+        ]
+
+    def insert(self, user_id, recipe_ids):
+        if self.connection.vendor == 'postgresql':
+            return self.insert_postgresql(user_id, recipe_ids)
+        return self.insert_generic(user_id, recipe_ids)
+
+    def insert_generic(self, user_id, recipe_ids):
+        existing = self.model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)
+        added = list(Recipe.objects.filter(id__in=recipe_ids).exclude(
+            id__in=existing
+        ).values_list('id', flat=True))
+        self.model.objects.bulk_create(
+            [
+                self.model(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in added
+            ],
+            ignore_conflicts=True,
+        )
+        return added
+
+    def insert_postgresql(self, user_id, recipe_ids):
+        quote = self.connection.ops.quote_name
+        extra = self.extra_columns(user_id)
+        columns = ', '.join(quote(column) for column in (
+            'user_id', 'recipe_id', *(column for column, _ in extra)
+        ))
+        values = ', '.join(('%s', quote('id'), *('%s' for _ in extra)))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(self.model._meta.db_table)} ({columns}) '
+                f'SELECT {values} FROM {quote(Recipe._meta.db_table)} '
+                f'WHERE {quote("id")} = ANY(%s) '
+                f'ON CONFLICT DO NOTHING RETURNING {quote("recipe_id")}',
+                [user_id, *(value for _, value in extra), recipe_ids],
+            )
+            return [recipe_id for recipe_id, in cursor.fetchall()]
+
+    def delete(self, user_id, recipe_ids):
+        quote = self.connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        if self.connection.vendor == 'postgresql':
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {quote("user_id")} = %s '
+                    f'AND {quote("recipe_id")} = ANY(%s) '
+                    f'RETURNING {quote("recipe_id")}',
+                    [user_id, recipe_ids],
+                )
+                return [recipe_id for recipe_id, in cursor.fetchall()]
+        removed = list(self.model.objects.select_for_update().filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        if removed:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {quote("user_id")} = %s '
+                    f'AND {quote("recipe_id")} IN '
+                    f'({", ".join("%s" for _ in removed)})',
+                    [user_id, *removed],
+                )
+        return removed
+
+
+class ShoppingCartToggle(RecipeToggle):
+    def added(self, user_id, recipe_ids):
+        super().added(user_id, recipe_ids)
+        ShoppingListItem.objects.add_recipes(user_id, recipe_ids)
+
+    def removed(self, user_id, recipe_ids):
+        ShoppingListItem.objects.remove_recipes(user_id, recipe_ids)
+        super().removed(user_id, recipe_ids)
+
+
+FAVORITES = RecipeToggle(Favorites, 'favorites_count')
+SHOPPING_CART = ShoppingCartToggle(ShoppingCart, 'in_carts_count')
@@ -0,0 +1,21 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    version = max(time.time_ns(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    return version
@@ -1,6 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db.models import (CASCADE, CharField, EmailField, ForeignKey,
-                              Model, UniqueConstraint)
+                              Model, PositiveIntegerField, UniqueConstraint)
 
 from foodgram.settings import MAX_LEN_USERS_CHARFIELD
 
@@ -11,6 +11,8 @@ class User(AbstractUser):
     first_name = CharField(max_length=MAX_LEN_USERS_CHARFIELD)
     last_name = CharField(max_length=MAX_LEN_USERS_CHARFIELD)
     password = CharField(max_length=MAX_LEN_USERS_CHARFIELD)
+    recipes_count = PositiveIntegerField(default=0, editable=False)
+    followers_count = PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['username']
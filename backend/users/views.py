@@ -1,13 +1,15 @@
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
-                                   HTTP_204_NO_CONTENT)
+                                   HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST)
 
 from api.paginators import PageLimitPagination
-from api.serializers import FollowSerializer, SubscriptionSerializer
+from api.serializers import (FollowSerializer, SubscriptionSerializer,
+                             get_recipes_limit, group_recipes_by_author)
 from .models import Subscription, User
 
 
@@ -35,13 +37,22 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def get_subscriptions(self, request):
-        queryset = self.paginate_queryset(
-            User.objects.filter(following__user=request.user)
+        authors = self.paginate_queryset(
+            User.objects.filter(following__user=request.user).annotate(
+                is_subscribed=Value(True, output_field=BooleanField())
+            )
+        )
+        recipes_by_author = group_recipes_by_author(
+            [author.id for author in authors],
+            get_recipes_limit(request),
         )
         return self.get_paginated_response(SubscriptionSerializer(
-            queryset,
+            authors,
             many=True,
-            context={'request': request}
+            context={
+                'request': request,
+                'recipes_by_author': recipes_by_author,
+            }
         ).data)
 
     @action(
@@ -52,18 +63,23 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         user = request.user
+        author = get_object_or_404(User, id=id)
         if request.method == 'POST':
-            data = {'user': user.id, 'author': id}
-            serializer = FollowSerializer(
-                data=data,
-                context={'request': request}
+            if author == user:
+                return Response(
+                    {'errors': 'Нельзя подписаться на самого себя.'},
+                    status=HTTP_400_BAD_REQUEST,
+                )
+            subscription, created = Subscription.objects.get_or_create(
+                user=user,
+                author=author,
+            )
+            return Response(
+                FollowSerializer(
+                    subscription,
+                    context={'request': request},
+                ).data,
+                status=HTTP_201_CREATED if created else HTTP_200_OK,
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=HTTP_201_CREATED)
-        get_object_or_404(
-            Subscription,
-            user=user,
-            author=get_object_or_404(User, id=id)
-        ).delete()
+        Subscription.objects.filter(user=user, author=author).delete()
         return Response(status=HTTP_204_NO_CONTENT)